@@ -1,121 +1,436 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from models import db, Classroom, Booking
-from datetime import datetime
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'devkey'
+from flask import Flask, Blueprint, Response, current_app, render_template, stream_template, stream_with_context, request, redirect, url_for, flash, make_response, jsonify, abort
+from models import db, Classroom, Booking, RoomUtilization, DAYS, day_index, to_minutes, format_minutes
+from interval_index import IntervalIndex
+from occupancy import OccupancyGrid
+from render_cache import RenderCache
+from teacher_directory import TeacherDirectory
+from slot_search import find_slots
+from live_feed import LiveFeed, format_sse
+from export import ExportRow, stream_ics, stream_csv
+from catalog import ClassroomCatalog
+import timetable_import
+from scheduler import PeriodicTask
+from transactions import configure_sqlite, atomic_write
+from instrumentation import Instrumentation
+from sqlalchemy import delete, func, insert, select, tuple_
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
+from werkzeug.local import LocalProxy
+from werkzeug.utils import secure_filename
+import hashlib
+import batch
+import booking_events
+import click
+import io
+import os
+import re
+import recurrence
+import time
+import utilization
+
+# ---------------- Configuration ----------------
+def env_config():
+    """Default settings, read from the environment each time an app is created."""
+    env = os.environ.get
+    return {
+        'SQLALCHEMY_DATABASE_URI': env('DATABASE_URL', 'sqlite:///database.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SECRET_KEY': env('SECRET_KEY', 'devkey'),
+        # Load the in-memory booking caches in create_app (worth it with `gunicorn --preload`,
+        # where workers inherit them); otherwise each worker loads them on its first request.
+        'WARM_BOOKING_CACHES': env('WARM_BOOKING_CACHES', '0') == '1',
+        # Seconds between background purges of finished bookings; 0 disables the
+        # in-process scheduler (run `flask purge-bookings --loop` as a worker instead).
+        'PURGE_INTERVAL_SECONDS': int(env('PURGE_INTERVAL_SECONDS', 300)),
+        'RENDER_CACHE_SIZE': int(env('RENDER_CACHE_SIZE', 256)),  # rendered timetables kept
+        'API_MAX_BATCH': int(env('API_MAX_BATCH', 10000)),  # items per /api/bookings request
+        'SLOT_SEARCH_MAX_RESULTS': 100,  # cap on /find_slots and /api/slots results
+        'EXPORT_FETCH_ROWS': 1000,  # rows fetched per round trip while streaming an export
+        'MAX_CONTENT_LENGTH': 32 * 1024 * 1024,  # largest request body, i.e. /import upload
+        'IMPORT_REPORT_ROWS': 200,  # rejected rows listed on the /import page
+        'OCCURRENCE_MAX_DAYS': 366,  # widest date range /api/occurrences or a dated slot search covers
+        'STATS_OPEN_HOURS': (8, 18),  # hours /stats counts as available (08:00-18:00, Monday-Saturday)
+        # SQLite under many workers/threads: how long to wait for the write lock, how
+        # often to retry a write that still couldn't get it, and the connection pool.
+        'SQLITE_BUSY_TIMEOUT_MS': int(env('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'WRITE_RETRIES': int(env('WRITE_RETRIES', 5)),
+        'SQLALCHEMY_ENGINE_OPTIONS': {
+            'pool_size': int(env('DB_POOL_SIZE', 10)),
+            'max_overflow': int(env('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': 30,
+            'connect_args': {'check_same_thread': False},
+        },
+        'BOOKING_LOG_KEEP': 50000,  # booking_log entries kept for other workers to replay
+        # Per-request SQL/render timing, Server-Timing headers and /metrics (off by default)
+        'INSTRUMENTATION': env('INSTRUMENTATION', '0') == '1',
+        'SLOW_REQUEST_MS': int(env('SLOW_REQUEST_MS', 500)),  # log slower requests with their queries
+        # Live /events feed: how often a worker with open streams picks up other workers' writes,
+        # and how often an idle stream gets a keep-alive comment.
+        'LIVE_FEED_SYNC_SECONDS': float(env('LIVE_FEED_SYNC_SECONDS', 2)),
+        'LIVE_FEED_HEARTBEAT_SECONDS': float(env('LIVE_FEED_HEARTBEAT_SECONDS', 15)),
+    }
+
 SECRET_ACCESS_CODE = "ITDept@2025"
+SAMPLE_ROOMS = ["IT-201", "IT-202", "IT-Lab1", "IT-Lab2"]
+
+bp = Blueprint('main', __name__, cli_group=None)
+
+# ---------------- In-memory booking caches ----------------
+# One set per app, made by create_app and kept in app.extensions, so apps on
+# different databases in one process (tests, benchmarks) never share them.
+# The module-level names below resolve to the current app's copy.
+class BookingCaches:
+    """An app's listeners on its booking_events hub, plus its classroom catalog."""
+
+    def __init__(self, events, render_cache_size):
+        self.booking_index = events.subscribe(IntervalIndex())            # conflict checks
+        self.occupancy_grid = events.subscribe(OccupancyGrid())           # free-room searches
+        self.timetable_cache = events.subscribe(RenderCache(render_cache_size))  # home() pages
+        self.teacher_directory = events.subscribe(TeacherDirectory())     # /api/teachers autocomplete
+        self.live_feed = events.subscribe(LiveFeed())                     # /events streams
+        self.classrooms = ClassroomCatalog()  # every room, reloaded on catalog_version change
+
+def app_cache(name):
+    return LocalProxy(lambda: getattr(current_app.extensions['booking_caches'], name))
+
+booking_hub = LocalProxy(booking_events.current)
+booking_index = app_cache('booking_index')
+occupancy_grid = app_cache('occupancy_grid')
+timetable_cache = app_cache('timetable_cache')
+teacher_directory = app_cache('teacher_directory')
+live_feed = app_cache('live_feed')
+classrooms = app_cache('classrooms')
+
+def load_booking_caches():
+    """(Re)build every in-memory booking cache from the DB in one query."""
+    booking_hub.reload(db.session)
+
+def ensure_booking_caches():
+    """Apply writes other workers committed since this app last looked."""
+    booking_hub.sync(db.session)
 
-db.init_app(app)
+@bp.before_app_request
+def sync_booking_caches():
+    ensure_booking_caches()
+    classrooms.sync(db.session)
+
+def run_write(work):
+    """Run work() in a BEGIN IMMEDIATE transaction with retries, then commit."""
+    return atomic_write(db.session, work, current_app.config['WRITE_RETRIES'])
 
 # ---------------- Setup DB & sample data ----------------
-with app.app_context():
+def init_db():
+    """Create missing tables and the sample rooms on an empty database."""
     db.create_all()
     if not Classroom.query.first():
-        sample_rooms = ["IT-201", "IT-202", "IT-Lab1", "IT-Lab2"]
-        for room_name in sample_rooms:
+        for room_name in SAMPLE_ROOMS:
             db.session.add(Classroom(room_name=room_name))
         db.session.commit()
+    if utilization.stored_week(db.session) is None:
+        run_write(lambda: utilization.rebuild(db.session))  # table never built, or added to an old database
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the tables and sample classrooms (safe to run again)."""
+    init_db()
+    click.echo(f"Initialized {db.engine.url.render_as_string(hide_password=True)}.")
 
-# ---------------- Helper: Remove past bookings for today ----------------
+@bp.cli.command('rebuild-utilization')
+def rebuild_utilization_command():
+    """Recompute the room_utilization table behind /stats for this week's bookings."""
+    started = time.perf_counter()
+    run_write(lambda: utilization.rebuild(db.session))
+    click.echo(f"Rebuilt room utilization in {time.perf_counter() - started:.2f}s.")
+
+# ---------------- Helper: Remove expired bookings ----------------
 def remove_past_bookings():
-    now = datetime.now()
-    today_str = now.strftime("%A")  # e.g., "Monday"
-    bookings = Booking.query.filter_by(day=today_str).all()
-    for b in bookings:
-        booking_end_time = datetime.strptime(b.end_time, "%H:%M").time()
-        if booking_end_time < now.time():
-            db.session.delete(b)
-    db.session.commit()
+    """Delete bookings whose last date (valid_to) has passed, in one statement.
+
+    Bookings with a date in the week room_utilization counts are kept until
+    that week is over, so /stats still shows the hours they took; the same
+    transaction first rolls the aggregate over to a new week. Weekly classes
+    without an end date are never removed. Returns the number of rows removed.
+    Runs from the purge scheduler or the purge-bookings CLI command, never
+    from a request.
+    """
+    def purge():
+        utilization.roll_over(db.session, utilization.current_week())
+        cutoff = min(date.today(), utilization.stored_week(db.session))
+        removed = db.session.execute(
+            delete(Booking)
+            .where(Booking.valid_to < cutoff)
+            .returning(*booking_events.ROW_COLUMNS)
+        ).all()
+        booking_events.record(db.session, [
+            booking_events.BookingChange("delete", booking_events.BookingRow(*r), None)
+            for r in removed
+        ])
+        booking_events.prune_log(db.session, current_app.config['BOOKING_LOG_KEEP'])
+        return len(removed)
+
+    return run_write(purge)
+
+def sync_for_live_feed():
+    # Other workers' writes only reach this one on a request; streams aren't requests
+    if len(live_feed):
+        ensure_booking_caches()
+
+def in_app_context(app, func):
+    """Wrap func for a background thread, which has no app context of its own."""
+    def run():
+        with app.app_context():
+            func()
+    return run
+
+@bp.cli.command('purge-bookings')
+@click.option('--loop', is_flag=True, help='Keep running, purging every PURGE_INTERVAL_SECONDS.')
+@click.option('--interval', type=int, default=None, help='Override the purge interval in seconds.')
+def purge_bookings_command(loop, interval):
+    """Delete bookings whose last date has passed and roll /stats over to a new week."""
+    interval = interval or current_app.config['PURGE_INTERVAL_SECONDS'] or 300
+    while True:
+        click.echo(f"Removed {remove_past_bookings()} past booking(s).")
+        if not loop:
+            return
+        time.sleep(interval)
+
+# ---------------- Helper: Parse form slots ----------------
+def parse_slot(day, start, end):
+    """Turn form values ('Monday', '09:00', '10:00') into (day, start_min, end_min).
+
+    Raises ValueError with a user-facing message.
+    """
+    try:
+        slot = (day_index(day), to_minutes(start), to_minutes(end))
+    except (AttributeError, ValueError):
+        raise ValueError("Enter a weekday name and times as HH:MM.") from None
+    if slot[2] <= slot[1]:
+        raise ValueError("End time must be after start time.")
+    return slot
+
+DATE_FIELDS = ('date', 'valid_from', 'valid_to')
+
+def parse_rule(values, day, today):
+    """Read a form's date fields into (weekday name, recurrence.Rule).
+
+    'date' means that single date (the weekday follows from it); otherwise
+    'valid_from' / 'valid_to' bound a weekly rule, which starts today unless
+    told otherwise. Raises ValueError with a user-facing message.
+    """
+    try:
+        once, first, last = (date.fromisoformat(values[f]) if values.get(f) else None
+                             for f in DATE_FIELDS)
+    except ValueError:
+        raise ValueError("Enter dates as YYYY-MM-DD.") from None
+    if once:
+        weekday = DAYS[once.weekday()]
+        if day and day.strip().lower() != weekday.lower():
+            raise ValueError(f"{once.isoformat()} is a {weekday}.")
+        if once < today:
+            raise ValueError("That date has already passed.")
+        return weekday, recurrence.Rule(once, once)
+    first = first or today
+    if last is not None and last < first:
+        raise ValueError("The last week must not come before the first.")
+    return day, recurrence.Rule(first, last)
+
+def parse_week(value, today):
+    """Monday of the week containing the ?week= date; this week if missing or invalid."""
+    try:
+        return recurrence.week_start(date.fromisoformat(value) if value else today)
+    except ValueError:
+        return recurrence.week_start(today)
 
 # ---------------- Helper: Check conflicts ----------------
-def get_conflict_booking(room_name, day, start, end):
-    classroom = Classroom.query.filter_by(room_name=room_name).first()
-    if not classroom:
-        return None
-    bookings = Booking.query.filter_by(classroom_id=classroom.id, day=day).all()
-    for b in bookings:
-        if not (end <= b.start_time or start >= b.end_time):
-            return b
-    return None
+def get_conflict_booking(classroom_id, day, start, end, exclude_id=None, rule=recurrence.ALWAYS):
+    """Return the booking (as an index Interval) overlapping [start, end) minutes on a date of rule, or None."""
+    ensure_booking_caches()
+    return booking_index.find_conflict(classroom_id, day, start, end, exclude_id, rule)
 
 # ---------------- Home: Timetable ----------------
-@app.route('/', methods=['GET', 'POST'])
+@bp.route('/', methods=['GET', 'POST'])
 def home():
-    remove_past_bookings()  # Clean up old bookings
-
-    rooms = Classroom.query.all()
-    selected_room_name = request.form.get('room_filter')  # dropdown POST value
+    rooms = classrooms.rooms
+    selected_room_name = request.values.get('room_filter')  # dropdown value (GET, or POST from old pages)
+    today = date.today()
+    week = parse_week(request.values.get('week'), today)
 
     # Default: first classroom if none selected
     if not selected_room_name and rooms:
         selected_room_name = rooms[0].room_name
 
-    # Filter rooms for display (only selected room)
-    display_rooms = Classroom.query.filter_by(room_name=selected_room_name).all() if selected_room_name else []
-
-    rooms_data = []
-    for r in display_rooms:
-        schedule = {}
-        for b in r.bookings:
-            if b.day.lower() == "sunday":
-                continue
-            schedule.setdefault(b.day, []).append((b.start_time, b.end_time, b.teacher_name))
-        for day in schedule:
-            schedule[day].sort(key=lambda x: x[0])
-        rooms_data.append({
-            "room_name": r.room_name,
-            "room_type": r.room_type,
-            "schedule": schedule
-        })
+    selected = classrooms.find(selected_room_name)
+    if selected is None:
+        return render_timetable(rooms, [], selected_room_name, week)
+
+    # The page depends on the selected room's bookings, the week shown and the dropdown contents
+    version, last_modified = timetable_cache.version(selected.id)
+    if week == recurrence.week_start(today):
+        # Without ?week= the page moves on to a new week each Monday, with no write to the room
+        last_modified = max(last_modified, datetime.combine(week, datetime.min.time()).astimezone())
+    key = (selected.id, version, classrooms.generation, week)
+    page = timetable_cache.get(key)
+    if page is None:
+        page = timetable_cache.put(key, render_timetable(rooms, [selected], selected_room_name, week),
+                                   last_modified)
+
+    response = make_response(page.body)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.cache_control.no_cache = True  # always revalidate; unchanged pages come back as 304
+    return response.make_conditional(request)
 
+def room_schedule(r, week):
+    """Template data for one room: the bookings on each date of `week` (Sunday skipped), sorted by start.
+
+    Read from the booking index, so rendering doesn't query at all.
+    """
+    schedule = {}
+    dates = {}
+    for day, day_name in enumerate(DAYS[:6]):
+        dates[day_name] = week + timedelta(days=day)
+        intervals = booking_index.intervals_on(r.id, dates[day_name])
+        if intervals:
+            schedule[day_name] = [(format_minutes(iv.start_min), format_minutes(iv.end_min),
+                                   iv.teacher_name, iv.id) for iv in intervals]
+    return {
+        "id": r.id,
+        "room_name": r.room_name,
+        "room_type": r.room_type,
+        "schedule": schedule,
+        "dates": dates
+    }
+
+def render_timetable(rooms, display_rooms, selected_room_name, week):
     return render_template(
         'index.html',
-        rooms_data=rooms_data,
+        rooms_data=[room_schedule(r, week) for r in display_rooms],
         rooms=rooms,
-        selected_room_name=selected_room_name
+        selected_room_name=selected_room_name,
+        week=week,
+        previous_week=week - timedelta(days=7),
+        next_week=week + timedelta(days=7)
+    )
+
+# ---------------- Building / Floor Timetable ----------------
+# seed_timetable names rooms f"{10 + floor}{number:0{width}d}" with one width
+# for the whole building (2, wider past 99 rooms a floor), so the prefix alone
+# can't be told apart from the number; ground-floor labs are 1016A, 1016B, ...
+GROUND_LAB_PATTERN = re.compile(r"^(\d+)\d{2}[A-Za-z]$")  # 1016A -> 10
+
+def room_number_width(room_names):
+    """Digits after the floor prefix: floor 1's rooms ('11' + number) are the shortest numeric names."""
+    lengths = [len(name) for name in room_names if name.isdigit()]
+    return max(2, min(lengths) - 2) if lengths else 2
+
+def floor_of(room_name, width=2):
+    """Floor prefix of a seed_timetable room name: 1101 -> 11, or 11001 -> 11 at width 3.
+
+    'IT-201' style names group by department.
+    """
+    if room_name.isdigit() and len(room_name) > width:
+        return room_name[:-width]
+    match = GROUND_LAB_PATTERN.match(room_name)
+    return match.group(1) if match else room_name.split("-")[0]
+
+def floor_label(floor, width=2):
+    return floor + "x" * width if floor.isdigit() else floor
+
+def floor_sort_key(floor):
+    return (not floor.isdigit(), len(floor), floor)
+
+@bp.route('/building')
+@bp.route('/building/<floor>')
+def building(floor=None):
+    # Rooms come from the catalog and bookings from the index: no queries at all
+    width = room_number_width(r.room_name for r in classrooms.rooms)
+    floor_of_room = {r.id: floor_of(r.room_name, width) for r in classrooms.rooms}
+    rooms = [r for r in classrooms.rooms if floor is None or floor_of_room[r.id] == floor]
+    if floor and not rooms:
+        abort(404)
+    rooms.sort(key=lambda r: (floor_sort_key(floor_of_room[r.id]), r.room_name))
+    floors = sorted(set(floor_of_room.values()), key=floor_sort_key)
+    week = parse_week(request.args.get('week'), date.today())
+
+    def floor_groups():
+        for f, floor_rooms in groupby(rooms, key=lambda r: floor_of_room[r.id]):
+            yield {"floor": f, "label": floor_label(f, width),
+                   "rooms": [room_schedule(r, week) for r in floor_rooms]}
+
+    return stream_template(
+        'building.html',
+        floor_groups=floor_groups(),
+        floors=[(f, floor_label(f, width)) for f in floors],
+        floor=floor,
+        floor_label=floor_label(floor, width) if floor else None,
+        week=week,
+        previous_week=week - timedelta(days=7),
+        next_week=week + timedelta(days=7)
     )
 
 # ---------------- Book Classroom ----------------
-@app.route('/book', methods=['GET', 'POST'])
+@bp.route('/book', methods=['GET', 'POST'])
 def book():
-    rooms = Classroom.query.all()
+    rooms = classrooms.rooms
     if request.method == 'POST':
         teacher = request.form['teacher']
         room = request.form['room']
-        day = request.form['day']
+        day = request.form.get('day', '')
         start = request.form['start']
         end = request.form['end']
         code = request.form['code']
 
         if code != SECRET_ACCESS_CODE:
             flash("Invalid access code. Booking denied.", "danger")
-            return redirect(url_for('book'))
+            return redirect(url_for('main.book'))
+
+        try:
+            day, rule = parse_rule(request.form, day, date.today())
+            day_num, start_min, end_min = parse_slot(day, start, end)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('main.book'))
 
-        conflict = get_conflict_booking(room, day, start, end)
+        classroom = classrooms.find(room)
+        if not classroom:
+            flash("Unknown classroom.", "danger")
+            return redirect(url_for('main.book'))
+
+        classroom_id = classroom.id
+        conflict = get_conflict_booking(classroom_id, day_num, start_min, end_min, rule=rule)
         if conflict:
             flash(f"Room already booked by {conflict.teacher_name}", "warning")
-            return redirect(url_for('book'))
-
-        classroom = Classroom.query.filter_by(room_name=room).first()
-        new_booking = Booking(
-            classroom_id=classroom.id,
-            teacher_name=teacher,
-            day=day,
-            start_time=start,
-            end_time=end
-        )
-        db.session.add(new_booking)
-        db.session.commit()
+            return redirect(url_for('main.book'))
+
+        def insert_booking():
+            # Re-check under the write lock: another worker may have just taken the slot
+            clash = Booking.first_clash(classroom_id, day_num, start_min, end_min, rule)
+            if clash:
+                return clash.teacher_name
+            db.session.add(Booking(
+                classroom_id=classroom_id,
+                teacher_name=teacher,
+                day=day_num,
+                start_min=start_min,
+                end_min=end_min,
+                valid_from=rule.valid_from,
+                valid_to=rule.valid_to
+            ))
+            return None
+
+        clash = run_write(insert_booking)
+        if clash:
+            flash(f"Room already booked by {clash}", "warning")
+            return redirect(url_for('main.book'))
         flash("Booking successful!", "success")
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     room_prefill = request.args.get('room', '')
     day_prefill = request.args.get('day', '')
     start_prefill = request.args.get('start', '')
     end_prefill = request.args.get('end', '')
+    date_prefill = request.args.get('date', '')
 
     return render_template(
         'book.html',
@@ -123,11 +438,12 @@ def book():
         room_prefill=room_prefill,
         day_prefill=day_prefill,
         start_prefill=start_prefill,
-        end_prefill=end_prefill
+        end_prefill=end_prefill,
+        date_prefill=date_prefill
     )
 
 # ---------------- Cancel Booking ----------------
-@app.route('/cancel', methods=['GET', 'POST'])
+@bp.route('/cancel', methods=['GET', 'POST'])
 def cancel():
     if request.method == 'POST':
         if 'fetch_bookings' in request.form:
@@ -136,14 +452,15 @@ def cancel():
 
             if code != SECRET_ACCESS_CODE:
                 flash("Invalid access code.", "danger")
-                return redirect(url_for('cancel'))
+                return redirect(url_for('main.cancel'))
 
             bookings = Booking.query.filter_by(teacher_name=teacher).all()
             if not bookings:
                 flash("No bookings found for this teacher.", "warning")
                 return render_template('cancel.html', bookings=[], teacher=teacher, code=code)
 
-            return render_template('cancel.html', bookings=bookings, teacher=teacher, code=code)
+            return render_template('cancel.html', bookings=bookings, teacher=teacher, code=code,
+                                   rooms_by_id=classrooms.by_id)
 
         elif 'cancel_selected' in request.form:
             teacher = request.form['teacher']
@@ -151,72 +468,409 @@ def cancel():
 
             if code != SECRET_ACCESS_CODE:
                 flash("Invalid access code.", "danger")
-                return redirect(url_for('cancel'))
+                return redirect(url_for('main.cancel'))
 
             selected_ids = request.form.getlist('booking_ids')
             if not selected_ids:
                 flash("No bookings selected for cancellation.", "warning")
-                return redirect(url_for('cancel'))
+                return redirect(url_for('main.cancel'))
+
+            ids = [int(bid) for bid in selected_ids]
+            try:
+                on_date = date.fromisoformat(request.form['date']) if request.form.get('date') else None
+            except ValueError:
+                flash("Enter the date as YYYY-MM-DD.", "danger")
+                return redirect(url_for('main.cancel'))
 
-            for bid in selected_ids:
-                booking = Booking.query.get(int(bid))
-                if booking and booking.teacher_name == teacher:
-                    db.session.delete(booking)
-            db.session.commit()
-            flash("Selected bookings cancelled successfully!", "success")
-            return redirect(url_for('home'))
+            def delete_selected():
+                # With a date, weekly bookings just skip that date; one-offs on it go entirely
+                skipped = 0
+                for booking in Booking.query.filter(Booking.id.in_(ids), Booking.teacher_name == teacher):
+                    if on_date is None or booking.valid_from == booking.valid_to == on_date:
+                        db.session.delete(booking)
+                    elif recurrence.occurs_on(booking, booking.day, on_date):
+                        booking.except_dates = recurrence.format_dates(booking.exceptions | {on_date})
+                    else:
+                        skipped += 1
+                return skipped
+
+            skipped = run_write(delete_selected)
+            if skipped:
+                flash(f"{skipped} selected booking(s) don't take place on {on_date.isoformat()} "
+                      f"and were left unchanged.", "warning")
+            elif on_date:
+                flash(f"Selected bookings cancelled for {on_date.isoformat()}.", "success")
+            else:
+                flash("Selected bookings cancelled successfully!", "success")
+            return redirect(url_for('main.home'))
 
     return render_template('cancel.html')
 
 # ---------------- Check Availability ----------------
-@app.route('/check_availability', methods=['GET', 'POST'])
+@bp.route('/check_availability', methods=['GET', 'POST'])
 def check_availability():
-    remove_past_bookings()
-    rooms = Classroom.query.all()
+    rooms = classrooms.rooms
     available_rooms = []
 
     if request.method == 'POST':
-        day = request.form['day']
+        day = request.form.get('day', '')
         start = request.form['start']
         end = request.form['end']
 
-        for room in rooms:
-            bookings = Booking.query.filter_by(classroom_id=room.id, day=day).all()
-            conflict = False
-            for b in bookings:
-                if not (end <= b.start_time or start >= b.end_time):
-                    conflict = True
-                    break
-            if not conflict:
-                available_rooms.append(room)
+        try:
+            day, rule = parse_rule(request.form, day, date.today())
+            day_num, start_min, end_min = parse_slot(day, start, end)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('main.check_availability'))
+
+        room_ids = [r.id for r in rooms]
+        free_ids = set(occupancy_grid.free_rooms(day_num, start_min, end_min, room_ids))
+        # The grid counts every rule on the weekday; re-check the other rooms' rules against the dates asked for
+        free_ids.update(i for i in room_ids if i not in free_ids
+                        and not booking_index.find_conflict(i, day_num, start_min, end_min, rule=rule))
+        available_rooms = [r for r in rooms if r.id in free_ids]
 
         return render_template(
             'check_availability.html',
             available_rooms=available_rooms,
-            day=day,
+            day=DAYS[day_num],
             start=start,
-            end=end
+            end=end,
+            on_date=request.form.get('date', '')
         )
 
     return render_template('check_availability.html', rooms=rooms)
 
+# ---------------- Live timetable feed (Server-Sent Events) ----------------
+@bp.route('/events')
+def live_events():
+    """Stream booking-created/-updated/-cancelled events for one room (or every room).
+
+    Each open stream waits on a queue, so run gunicorn with the gevent worker
+    (see Procfile) to keep hundreds of idle displays cheap; gunicorn.conf.py
+    explains what that costs the database writes.
+    """
+    room_name = request.args.get('room')
+    classroom_id = None
+    if room_name:
+        room = classrooms.find(room_name)
+        if room is None:
+            abort(404)
+        classroom_id = room.id
+    db.session.remove()  # don't hold a pooled connection for the life of the stream
+
+    feed = live_feed._get_current_object()  # the stream outlives the request context
+    subscription = feed.subscribe(classroom_id)
+    heartbeat = current_app.config['LIVE_FEED_HEARTBEAT_SECONDS']
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(heartbeat)
+                yield format_sse(event) if event else ": keep-alive\n\n"
+        finally:
+            feed.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ---------------- Export (iCalendar / CSV) ----------------
+EXPORT_MIMETYPES = {"ics": "text/calendar", "csv": "text/csv"}
+
+def export_response(fmt, scope, title, *criteria):
+    """Stream bookings matching criteria as .ics or .csv, with ETag / conditional GET.
+
+    The ETag is derived from the booking_log position, which before_request
+    has just synced, so an unchanged timetable is answered with 304 without
+    touching the Booking table.
+    """
+    etag = hashlib.sha1(f"{scope}:{fmt}:{booking_hub.current_seq()}".encode()).hexdigest()
+    stmt = (
+        select(Booking.id, Booking.teacher_name, Booking.day, Booking.start_min, Booking.end_min,
+               Booking.created_at, Booking.valid_from, Booking.valid_to, Booking.except_dates,
+               Booking.classroom_id)
+        .where(*criteria)
+        .order_by(Booking.classroom_id, Booking.day, Booking.start_min)
+        .execution_options(yield_per=current_app.config['EXPORT_FETCH_ROWS'])
+    )
+
+    def rows():
+        for r in db.session.execute(stmt):
+            room = classrooms.get(r.classroom_id)
+            yield ExportRow(*r[:9], room.room_name if room else "", room.room_type if room else "")
+
+    if fmt == "ics":
+        body = stream_ics(rows(), title, request.host)
+    else:
+        body = stream_csv(rows())
+    response = Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="{secure_filename(title) or "timetable"}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@bp.route('/export/room/<name>.<any(ics, csv):fmt>')
+def export_room(name, fmt):
+    room = classrooms.find(name)
+    if room is None:
+        abort(404)
+    return export_response(fmt, f"room:{room.id}", f"Room {room.room_name}", Booking.classroom_id == room.id)
+
+@bp.route('/export/teacher/<name>.<any(ics, csv):fmt>')
+def export_teacher(name, fmt):
+    if name not in teacher_directory:
+        abort(404)
+    return export_response(fmt, f"teacher:{name}", name, Booking.teacher_name == name)
+
+@bp.route('/export/building.<any(ics, csv):fmt>')
+def export_building(fmt):
+    return export_response(fmt, "building", "Building timetable")
+
+# ---------------- Timetable import (CSV / JSON Lines) ----------------
+def import_timetable(rows, dry_run=False):
+    """Validate, conflict-check and bulk-insert rows from timetable_import.read_rows.
+
+    Returns (number imported, list of problem dicts sorted by line). Rows take
+    the same date fields as the booking form, so weekly rows start today unless
+    they say otherwise. Clashes on shared dates, within the file and with
+    stored bookings, are found by one sort-and-sweep (batch.sweep) under the
+    write lock; clean rows go in with one executemany INSERT, so a rejected
+    row never blocks the rest of the file. Ids are handed out from max(id)
+    while the lock is held, which saves a RETURNING round trip per row.
+    """
+    room_ids = {r.room_name: r.id for r in classrooms.rooms}
+    room_names = {r.id: r.room_name for r in classrooms.rooms}
+    slot = lru_cache(maxsize=4096)(parse_slot)  # a timetable repeats a handful of slots
+    today = date.today()
+    planned, problems = [], []
+    for line, fields in rows:
+        try:
+            if isinstance(fields, ValueError):
+                raise fields
+            missing = [f for f in timetable_import.FIELDS
+                       if not fields[f] and not (f == 'day' and fields['date'])]
+            if missing:
+                raise ValueError(f"Missing field(s): {', '.join(missing)}.")
+            if fields['room'] not in room_ids:
+                raise ValueError(f"Unknown classroom {fields['room']!r}.")
+            day_name, rule = parse_rule(fields, fields['day'], today)
+            day, start_min, end_min = slot(day_name, fields['start'], fields['end'])
+        except ValueError as e:
+            fields = fields if isinstance(fields, dict) else {}
+            problems.append(dict(line=line, status="invalid", detail=str(e),
+                                 **{f: fields.get(f, "") for f in timetable_import.FIELDS}))
+            continue
+        planned.append(batch.PlannedBooking(line, None, room_ids[fields['room']], fields['teacher'],
+                                            day, start_min, end_min, *rule))
+
+    def write():
+        # Stored bookings on the room-days the file touches, in one query
+        pairs = {(p.classroom_id, p.day) for p in planned}
+        query = db.session.query(*booking_events.ROW_COLUMNS)
+        if len(pairs) <= 500:
+            query = query.filter(tuple_(Booking.classroom_id, Booking.day).in_(pairs))
+        existing = [row for row in query if (row.classroom_id, row.day) in pairs]
+
+        rejected = batch.sweep(existing, planned)
+        accepted = [p for p in planned if p.index not in rejected]
+        if accepted and not dry_run:
+            first_id = (db.session.query(func.max(Booking.id)).scalar() or 0) + 1
+            inserted = [booking_events.BookingRow(first_id + n, p.classroom_id, p.teacher_name,
+                                                  p.day, p.start_min, p.end_min, p.valid_from, p.valid_to,
+                                                  recurrence.format_dates(p.exceptions) or None)
+                        for n, p in enumerate(accepted)]
+            created_at = datetime.utcnow()
+            db.session.execute(insert(Booking.__table__),
+                               [dict(row._asdict(), created_at=created_at) for row in inserted])
+            booking_events.record(db.session, [
+                booking_events.BookingChange("insert", row, None) for row in inserted
+            ])
+        return rejected, len(accepted)
+
+    rejected, imported = run_write(write) if planned else ({}, 0)
+    ensure_booking_caches()  # a large import is picked up by reloading the caches
+    for p in planned:
+        if p.index in rejected:
+            c = rejected[p.index]
+            with_what = f"line {c.item_index}" if c.booking_id is None else f"booking #{c.booking_id}"
+            problems.append(dict(
+                line=p.index, status="conflict", room=room_names[p.classroom_id], teacher=p.teacher_name,
+                day=DAYS[p.day], start=format_minutes(p.start_min), end=format_minutes(p.end_min),
+                detail=f"Overlaps {with_what} ({c.teacher_name}, "
+                       f"{format_minutes(c.start_min)}-{format_minutes(c.end_min)})."))
+    problems.sort(key=lambda problem: problem['line'])
+    return imported, problems
+
+@bp.cli.command('import-timetable')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='File format; taken from the extension by default.')
+@click.option('--dry-run', is_flag=True, help='Check the file and report conflicts without writing.')
+@click.option('--report', type=click.File('w'), default=None, help='Write rejected rows to this CSV file.')
+def import_timetable_command(path, fmt, dry_run, report):
+    """Import bookings (room, teacher, day, start, end; optional date, valid_from, valid_to) from CSV or JSONL."""
+    fmt = fmt or timetable_import.detect_format(path)
+    started = time.perf_counter()
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            imported, problems = import_timetable(timetable_import.read_rows(f, fmt), dry_run)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    verb = "Would import" if dry_run else "Imported"
+    click.echo(f"{verb} {imported} booking(s); {len(problems)} row(s) rejected "
+               f"in {time.perf_counter() - started:.2f}s.")
+    if report:
+        timetable_import.write_report(problems, report)
+    else:
+        for problem in problems[:20]:
+            click.echo(f"  line {problem['line']}: {problem['status']}: {problem['detail']}", err=True)
+        if len(problems) > 20:
+            click.echo(f"  ... {len(problems) - 20} more; use --report to get them all.", err=True)
+
+@bp.route('/import', methods=['GET', 'POST'])
+def import_bookings():
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if request.form.get('code') != SECRET_ACCESS_CODE:
+            flash("Invalid access code. Cannot import bookings.", "danger")
+            return redirect(url_for('main.import_bookings'))
+        if upload is None or not upload.filename:
+            flash("Choose a CSV or JSONL file to import.", "warning")
+            return redirect(url_for('main.import_bookings'))
+
+        dry_run = bool(request.form.get('dry_run'))
+        fmt = timetable_import.detect_format(upload.filename)
+        try:
+            imported, problems = import_timetable(
+                timetable_import.read_rows(timetable_import.text_lines(upload.stream), fmt), dry_run)
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f"Could not read {upload.filename}: {e}", "danger")
+            return redirect(url_for('main.import_bookings'))
+
+        if request.form.get('report') and problems:
+            out = io.StringIO()
+            timetable_import.write_report(problems, out)
+            response = make_response(out.getvalue())
+            response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+            response.headers['Content-Disposition'] = 'attachment; filename="import-report.csv"'
+            return response
+
+        return render_template(
+            'import.html',
+            filename=upload.filename,
+            dry_run=dry_run,
+            imported=imported,
+            problems=problems[:current_app.config['IMPORT_REPORT_ROWS']],
+            problem_count=len(problems)
+        )
+
+    return render_template('import.html')
+
+# ---------------- Find Free Slots ----------------
+def parse_slot_search(values, today):
+    """Read find-slot filters from request args; raises ValueError with a user message.
+
+    With 'date_from' (and optionally 'date_to', a week later by default) the
+    search covers those dates; otherwise it looks for windows free every
+    week from today on.
+    """
+    try:
+        first = day_index(values.get('day_from') or "Monday")
+        last = day_index(values.get('day_to') or "Saturday")
+        open_min = to_minutes(values.get('from') or "08:00")
+        close_min = to_minutes(values.get('until') or "18:00")
+        duration = int(values.get('duration') or 60)
+        capacity = int(values.get('capacity') or 0)
+        limit = int(values.get('limit') or 10)
+    except (AttributeError, ValueError):
+        raise ValueError("Enter weekday names, times as HH:MM and whole numbers.") from None
+    try:
+        date_from, date_to = (date.fromisoformat(values[f]) if values.get(f) else None
+                              for f in ('date_from', 'date_to'))
+    except ValueError:
+        raise ValueError("Enter dates as YYYY-MM-DD.") from None
+    if last < first:
+        raise ValueError("'Day to' must not come before 'Day from'.")
+    if close_min <= open_min:
+        raise ValueError("End of the search window must be after its start.")
+    if duration <= 0 or limit <= 0:
+        raise ValueError("Duration and number of results must be positive.")
+    if date_from is None and date_to is not None:
+        raise ValueError("Give a first date along with the last one.")
+    if date_from is None:
+        days = [(day, None) for day in range(first, last + 1)]
+    else:
+        date_to = date_to or date_from + timedelta(days=6)
+        if date_from < today:
+            raise ValueError("That date has already passed.")
+        if date_to < date_from:
+            raise ValueError("The last date must not come before the first.")
+        if (date_to - date_from).days >= current_app.config['OCCURRENCE_MAX_DAYS']:
+            raise ValueError(f"Search at most {current_app.config['OCCURRENCE_MAX_DAYS']} days at a time.")
+        dates = (date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1))
+        days = [(d.weekday(), d) for d in dates if first <= d.weekday() <= last]
+    return {
+        "days": days,
+        "today": today,
+        "open_min": open_min,
+        "close_min": close_min,
+        "duration": duration,
+        "room_type": values.get('room_type') or None,
+        "capacity": capacity,
+        "limit": min(limit, current_app.config['SLOT_SEARCH_MAX_RESULTS']),
+    }
+
+def search_free_slots(criteria):
+    rooms = [r for r in classrooms.rooms
+             if (not criteria["room_type"] or r.room_type == criteria["room_type"])
+             and (r.capacity or 0) >= criteria["capacity"]]
+    weekly = recurrence.Rule(criteria["today"])  # free every week from today on
+
+    def busy(classroom_id, day, on):
+        if on is None:
+            return booking_index.intervals_for(classroom_id, day, weekly)
+        return booking_index.intervals_on(classroom_id, on)
+
+    return find_slots(rooms, criteria["days"], criteria["duration"], busy,
+                      criteria["open_min"], criteria["close_min"], criteria["limit"])
+
+@bp.route('/find_slots')
+def find_free_slots():
+    room_types = classrooms.room_types
+    slots = None
+    if 'duration' in request.args:
+        try:
+            slots = search_free_slots(parse_slot_search(request.args, date.today()))
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('main.find_free_slots'))
+    return render_template(
+        'find_slots.html',
+        slots=slots,
+        days=DAYS,
+        room_types=room_types,
+        form=request.args,
+        format_minutes=format_minutes
+    )
+
 # ---------------- Edit Booking ----------------
-@app.route('/edit_booking', methods=['GET', 'POST'])
+@bp.route('/edit_booking', methods=['GET', 'POST'])
 def edit_booking():
-    rooms = Classroom.query.all()
-
     if request.method == 'POST':
         teacher = request.form['teacher']
         code = request.form['code']
 
         if code != SECRET_ACCESS_CODE:
             flash("Invalid access code. Cannot edit booking.", "danger")
-            return redirect(url_for('edit_booking'))
+            return redirect(url_for('main.edit_booking'))
 
         bookings = Booking.query.filter_by(teacher_name=teacher).all()
         if not bookings:
             flash("No bookings found for this teacher.", "warning")
-            return redirect(url_for('edit_booking'))
+            return redirect(url_for('main.edit_booking'))
 
         selected_id = request.form.get('booking_id')
         new_day = request.form.get('new_day')
@@ -224,23 +878,430 @@ def edit_booking():
         new_end = request.form.get('new_end')
 
         if selected_id and new_day and new_start and new_end:
+            try:
+                day_num, start_min, end_min = parse_slot(new_day, new_start, new_end)
+            except ValueError as e:
+                flash(str(e), "danger")
+                return redirect(url_for('main.edit_booking'))
+
             booking = Booking.query.get(int(selected_id))
-            conflict = get_conflict_booking(booking.classroom.room_name, new_day, new_start, new_end)
-            if conflict and conflict.id != booking.id:
+            booking_id, classroom_id = booking.id, booking.classroom_id
+            rule = recurrence.moved(booking.rule, booking.day, day_num)
+            conflict = get_conflict_booking(classroom_id, day_num, start_min, end_min,
+                                            exclude_id=booking_id, rule=rule)
+            if conflict:
                 flash(f"Conflict! Room already booked by {conflict.teacher_name}", "warning")
-                return redirect(url_for('edit_booking'))
+                return redirect(url_for('main.edit_booking'))
+
+            def move_booking():
+                # Re-check under the write lock: another worker may have just taken the slot
+                clash = Booking.first_clash(classroom_id, day_num, start_min, end_min, rule,
+                                            exclude_id=booking_id)
+                if clash:
+                    return clash.teacher_name
+                moved = db.session.get(Booking, booking_id)
+                moved.day = day_num
+                moved.start_min = start_min
+                moved.end_min = end_min
+                moved.valid_from, moved.valid_to = rule.valid_from, rule.valid_to
+                moved.except_dates = recurrence.format_dates(rule.exceptions) or None
+                return None
 
-            booking.day = new_day
-            booking.start_time = new_start
-            booking.end_time = new_end
-            db.session.commit()
+            clash = run_write(move_booking)
+            if clash:
+                flash(f"Conflict! Room already booked by {clash}", "warning")
+                return redirect(url_for('main.edit_booking'))
             flash("Booking updated successfully!", "success")
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
 
-        return render_template('edit_booking.html', bookings=bookings)
+        return render_template('edit_booking.html', bookings=bookings, rooms_by_id=classrooms.by_id)
 
     return render_template('edit_booking.html', bookings=None)
 
+# ---------------- JSON API: bulk bookings ----------------
+# POST creates, PATCH updates and DELETE removes bookings in batches:
+#   {"code": "...", "mode": "atomic" | "partial", "bookings": [...]}
+# The access code may also be sent as an X-Access-Code header. In atomic mode
+# (the default) nothing is written unless every item is valid; in partial mode
+# the valid items are written and the rest are reported.
+
+def api_error(message, status):
+    return jsonify({"ok": False, "error": message}), status
+
+def api_result(results, atomic):
+    failed = sum(1 for r in results if r["status"] not in ("created", "updated", "deleted"))
+    applied = len(results) - failed if (failed == 0 or not atomic) else 0
+    status = 200
+    if failed and atomic:
+        status = 409 if any(r["status"] == "conflict" for r in results) else 400
+    return jsonify({"ok": failed == 0, "applied": applied, "failed": failed, "results": results}), status
+
+def is_booking_id(value):
+    # JSON true/false would otherwise pass as 1/0
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def conflict_json(conflict):
+    return {
+        "booking_id": conflict.booking_id,
+        "item_index": conflict.item_index,
+        "teacher": conflict.teacher_name,
+        "start": format_minutes(conflict.start_min),
+        "end": format_minutes(conflict.end_min),
+    }
+
+@bp.route('/api/bookings', methods=['POST', 'PATCH', 'DELETE'])
+def api_bookings():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return api_error("Expected a JSON object with a 'bookings' array.", 400)
+    if (request.headers.get('X-Access-Code') or payload.get('code')) != SECRET_ACCESS_CODE:
+        return api_error("Invalid access code.", 403)
+
+    items = payload.get('bookings')
+    if not isinstance(items, list) or not items:
+        return api_error("'bookings' must be a non-empty array.", 400)
+    if len(items) > current_app.config['API_MAX_BATCH']:
+        return api_error(f"At most {current_app.config['API_MAX_BATCH']} bookings per request.", 413)
+    mode = payload.get('mode', 'atomic')
+    if mode not in ('atomic', 'partial'):
+        return api_error("'mode' must be 'atomic' or 'partial'.", 400)
+
+    # Validation, conflict checks and writes all happen under one write lock
+    if request.method == 'DELETE':
+        return run_write(lambda: api_delete_bookings(items, mode == 'atomic'))
+    return run_write(lambda: api_write_bookings(items, mode == 'atomic', creating=request.method == 'POST'))
+
+def api_write_bookings(items, atomic, creating):
+    rooms = classrooms.rooms
+    rooms_by_name = {r.room_name: r for r in rooms}
+    room_names = {r.id: r.room_name for r in rooms}
+    targets = {}
+    if not creating:
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        ids = [i for i in ids if is_booking_id(i)]
+        targets = {b.id: b for b in Booking.query.filter(Booking.id.in_(ids))} if ids else {}
+
+    results = [None] * len(items)
+    planned = []
+    seen_ids = set()
+    today = date.today()
+    for index, item in enumerate(items):
+        try:
+            planned.append(plan_api_item(index, item, rooms_by_name, room_names, targets,
+                                         seen_ids, creating, today))
+        except ValueError as e:
+            results[index] = {"index": index, "status": "invalid", "error": str(e)}
+
+    # Existing bookings on every room-day the batch touches, in one query
+    pairs = {(p.classroom_id, p.day) for p in planned}
+    pairs |= {(targets[p.id].classroom_id, targets[p.id].day) for p in planned if p.id is not None}
+    existing = []
+    if pairs:
+        existing = [booking_events.snapshot(b) for b in
+                    Booking.query.filter(tuple_(Booking.classroom_id, Booking.day).in_(pairs))]
+
+    released = {p.id for p in planned if p.id is not None}
+    while True:
+        rejected = batch.plan(existing, planned, released)
+        # A move that was refused keeps its old slot, so it must block others again
+        kept = {planned_item.id for planned_item in planned
+                if planned_item.index in rejected and planned_item.id in released}
+        if not kept:
+            break
+        released -= kept
+
+    for p in planned:
+        if p.index in rejected:
+            results[p.index] = {"index": p.index, "status": "conflict",
+                                "conflict": conflict_json(rejected[p.index])}
+
+    failed = any(r is not None for r in results)
+    accepted = [p for p in planned if p.index not in rejected]
+    if failed and atomic:
+        for p in accepted:
+            results[p.index] = {"index": p.index, "status": "valid"}
+        return api_result(results, atomic)
+
+    written = []
+    for p in accepted:
+        if creating:
+            booking = Booking(classroom_id=p.classroom_id, teacher_name=p.teacher_name,
+                              day=p.day, start_min=p.start_min, end_min=p.end_min)
+            db.session.add(booking)
+        else:
+            booking = targets[p.id]
+            booking.classroom_id = p.classroom_id
+            booking.teacher_name = p.teacher_name
+            booking.day, booking.start_min, booking.end_min = p.day, p.start_min, p.end_min
+        booking.valid_from, booking.valid_to = p.valid_from, p.valid_to
+        booking.except_dates = recurrence.format_dates(p.exceptions) or None
+        written.append((p.index, booking))
+    db.session.flush()  # assigns ids; read them before commit expires the objects
+
+    status = "created" if creating else "updated"
+    for index, booking in written:
+        results[index] = {"index": index, "status": status, "id": booking.id}
+    return api_result(results, atomic)
+
+def plan_api_item(index, item, rooms_by_name, room_names, targets, seen_ids, creating, today):
+    """Validate one POST/PATCH item and return its PlannedBooking.
+
+    'date' / 'valid_from' / 'valid_to' work as on the booking form. A new
+    weekly booking starts today; a PATCH without them keeps the booking's
+    dates, shifted along if it moves to another weekday.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each booking must be a JSON object.")
+    wrong = [f for f in ('room', 'teacher', 'day', 'start', 'end') + DATE_FIELDS
+             if item.get(f) is not None and not isinstance(item[f], str)]
+    if wrong:
+        raise ValueError(f"Field(s) must be strings: {', '.join(wrong)}.")
+    if creating:
+        required = ('room', 'teacher', 'start', 'end') if item.get('date') else \
+            ('room', 'teacher', 'day', 'start', 'end')
+        missing = [f for f in required if not item.get(f)]
+        if missing:
+            raise ValueError(f"Missing field(s): {', '.join(missing)}.")
+        current = None
+    else:
+        booking_id = item.get('id')
+        current = targets.get(booking_id) if is_booking_id(booking_id) else None
+        if current is None:
+            raise ValueError("Unknown booking id.")
+        if current.id in seen_ids:
+            raise ValueError("Booking id appears more than once in this batch.")
+        seen_ids.add(current.id)
+
+    room_name = item.get('room') or room_names[current.classroom_id]
+    room = rooms_by_name.get(room_name)
+    if room is None:
+        raise ValueError(f"Unknown classroom {room_name!r}.")
+    day_name = item.get('day') or ''
+    if current is None or any(item.get(f) for f in DATE_FIELDS):
+        day_name, rule = parse_rule(item, day_name, today)
+    day, start_min, end_min = parse_slot(
+        day_name or current.day_name,
+        item.get('start') or current.start_time,
+        item.get('end') or current.end_time,
+    )
+    if current is not None and not any(item.get(f) for f in DATE_FIELDS):
+        rule = recurrence.moved(current.rule, current.day, day)  # a one-off stays in its week
+    teacher = item.get('teacher') or current.teacher_name
+    return batch.PlannedBooking(index, current.id if current else None, room.id,
+                                teacher, day, start_min, end_min, *rule)
+
+def api_delete_bookings(items, atomic):
+    results = []
+    ids = []
+    for index, item in enumerate(items):
+        booking_id = item.get('id') if isinstance(item, dict) else item
+        if not is_booking_id(booking_id):
+            results.append({"index": index, "status": "invalid", "error": "Expected a booking id."})
+        else:
+            results.append({"index": index, "status": "not_found", "id": booking_id})
+            ids.append(booking_id)
+
+    found = {b.id: b for b in Booking.query.filter(Booking.id.in_(ids))} if ids else {}
+    for result in results:
+        if result.get("id") in found:
+            result["status"] = "deleted"
+    failed = any(r["status"] != "deleted" for r in results)
+    if failed and atomic:
+        for result in results:
+            if result["status"] == "deleted":
+                result["status"] = "valid"
+        return api_result(results, atomic)
+
+    for booking in found.values():
+        db.session.delete(booking)
+    return api_result(results, atomic)
+
+# ---------------- JSON API: teacher autocomplete ----------------
+@bp.route('/api/teachers')
+def api_teachers():
+    prefix = request.args.get('prefix', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    return jsonify({"prefix": prefix, "teachers": teacher_directory.complete(prefix, limit)})
+
+# ---------------- JSON API: free slot search ----------------
+@bp.route('/api/slots')
+def api_slots():
+    try:
+        criteria = parse_slot_search(request.args, date.today())
+    except ValueError as e:
+        return api_error(str(e), 400)
+    return jsonify({
+        "slots": [{
+            "room": s.room_name,
+            "room_type": s.room_type,
+            "capacity": s.capacity,
+            "day": DAYS[s.day],
+            "date": s.date.isoformat() if s.date else None,
+            "start": format_minutes(s.start_min),
+            "end": format_minutes(s.end_min),
+            "minutes": s.end_min - s.start_min,
+        } for s in search_free_slots(criteria)]
+    })
+
+# ---------------- Room utilization (/stats) ----------------
+# Read from the room_utilization aggregate, which every booking write keeps
+# current, so the cost depends on rooms x hours and not on the bookings. It
+# counts one week's bookings; the purge (remove_past_bookings) rolls it over
+# to the next, so these read routes never write.
+
+def utilization_stats(week):
+    """Per-room booked minutes by weekday and hour in the stored week, with totals over the opening hours."""
+    open_hour, close_hour = current_app.config['STATS_OPEN_HOURS']
+    open_days = range(6)  # Monday-Saturday, like the timetable pages
+    grid = {r.id: [[0] * 24 for _ in DAYS] for r in classrooms.rooms}
+    for classroom_id, day, hour, minutes in db.session.execute(
+            select(RoomUtilization.classroom_id, RoomUtilization.day,
+                   RoomUtilization.hour, RoomUtilization.minutes)):
+        if classroom_id in grid:
+            grid[classroom_id][day][hour] = minutes
+
+    available = len(open_days) * (close_hour - open_hour) * 60
+    rooms = []
+    for r in classrooms.rooms:
+        open_cells = [grid[r.id][day][hour] for day in open_days for hour in range(open_hour, close_hour)]
+        booked = sum(open_cells)
+        rooms.append({
+            "room": r.room_name,
+            "room_type": r.room_type,
+            "capacity": r.capacity,
+            "booked_minutes": booked,
+            "utilization": round(booked / available, 3) if available else 0,
+            "idle_hours": sum(1 for minutes in open_cells if minutes == 0),
+            "overbooked_hours": sum(1 for minutes in open_cells if minutes > 60),
+            "days": {DAYS[day]: grid[r.id][day] for day in range(len(DAYS))},
+        })
+    return {"week": week.isoformat() if week else None, "open_hour": open_hour, "close_hour": close_hour,
+            "days": [DAYS[day] for day in open_days], "rooms": rooms}
+
+def stats_etag(kind, week):
+    # Only booking writes, room changes and a rollover to a new week move the aggregate
+    return hashlib.sha1(
+        f"{kind}:{week}:{booking_hub.current_seq()}:{classrooms.generation}".encode()).hexdigest()
+
+def not_modified(etag):
+    """A 304 if the request already holds `etag`, before any work is done; else None."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/stats')
+def stats():
+    day = request.args.get('day')
+    if day and day not in DAYS[:6]:
+        abort(404)
+    week = utilization.stored_week(db.session)
+    etag = stats_etag(f"html:{day}", week)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    stats = utilization_stats(week)
+    hours = range(stats["open_hour"], stats["close_hour"])
+    days = [day] if day else stats["days"]
+    for room in stats["rooms"]:
+        # One heatmap cell per hour: share of that hour booked across the days shown
+        room["cells"] = [(sum(room["days"][d][hour] for d in days) / (60 * len(days)),
+                          any(room["days"][d][hour] > 60 for d in days)) for hour in hours]
+    response = make_response(render_template(
+        'stats.html',
+        stats=stats,
+        hours=hours,
+        day=day,
+        format_minutes=format_minutes
+    ))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/api/stats')
+def api_stats():
+    week = utilization.stored_week(db.session)
+    etag = stats_etag("json", week)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    response = jsonify(utilization_stats(week))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+# ---------------- JSON API: dated occurrences ----------------
+@bp.route('/api/occurrences')
+def api_occurrences():
+    """A room's bookings expanded to dates from ?from= to ?to= (inclusive; default: the next 7 days)."""
+    room = classrooms.find(request.args.get('room', ''))
+    if room is None:
+        return api_error("Unknown classroom.", 404)
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else date.today()
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else start + timedelta(days=6)
+    except ValueError:
+        return api_error("Dates must be YYYY-MM-DD.", 400)
+    max_days = current_app.config['OCCURRENCE_MAX_DAYS']
+    if end < start or (end - start).days >= max_days:
+        return api_error(f"'to' must be on or after 'from' and at most {max_days} days later.", 400)
+    return jsonify({
+        "room": room.room_name,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "occurrences": [{
+            "id": o.rule.id,
+            "date": o.date.isoformat(),
+            "day": DAYS[o.day],
+            "start": format_minutes(o.start_min),
+            "end": format_minutes(o.end_min),
+            "teacher": o.rule.teacher_name,
+        } for o in booking_index.occurrences(room.id, start, end)]
+    })
+
+# ---------------- Application factory ----------------
+def create_app(config=None):
+    """Build the app from env_config() plus `config` overrides.
+
+    Nothing here touches the database (unless WARM_BOOKING_CACHES is set), so
+    gunicorn can --preload the app and fork workers from it; create the
+    schema with `flask init-db`.
+    """
+    app = Flask(__name__)
+    app.config.update(env_config())
+    if config:
+        app.config.update(config)
+    db.init_app(app)
+    with app.app_context():
+        configure_sqlite(db.engine, app.config['SQLITE_BUSY_TIMEOUT_MS'])
+        if app.config['INSTRUMENTATION']:
+            Instrumentation(app.config['SLOW_REQUEST_MS']).init_app(app, db.engine)
+    app.extensions['booking_caches'] = BookingCaches(booking_events.init_app(app),
+                                                     app.config['RENDER_CACHE_SIZE'])
+    app.register_blueprint(bp)
+
+    purge_task = PeriodicTask("purge-past-bookings", app.config['PURGE_INTERVAL_SECONDS'],
+                              in_app_context(app, remove_past_bookings))
+    live_feed_task = PeriodicTask("live-feed-sync", app.config['LIVE_FEED_SYNC_SECONDS'],
+                                  in_app_context(app, sync_for_live_feed))
+
+    @app.before_request
+    def start_background_tasks():
+        # Started from the first request so each gunicorn worker gets its own thread after fork
+        purge_task.start()
+        live_feed_task.start()
+
+    if app.config['WARM_BOOKING_CACHES']:
+        with app.app_context():
+            load_booking_caches()
+            db.session.remove()
+            db.engine.dispose()  # forked workers must open their own connections
+    return app
+
+app = create_app()
+
 # ---------------- Run App ----------------
 if __name__ == '__main__':
     app.run(debug=True)
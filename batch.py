@@ -0,0 +1,101 @@
+# batch.py
+# Conflict planning for writes that touch many bookings at once.
+
+from collections import namedtuple
+
+from interval_index import DaySlots, Interval, to_interval
+import recurrence
+
+# One booking a batch wants to end up with. id is None for new bookings and
+# the existing booking id for moves; index is the item's position in the batch.
+# valid_from / valid_to / exceptions make it a recurrence rule (default: always).
+PlannedBooking = namedtuple(
+    "PlannedBooking", "index id classroom_id teacher_name day start_min end_min valid_from valid_to exceptions",
+    defaults=(None, None, frozenset())
+)
+
+# What a rejected item collided with: an existing booking (booking_id set)
+# or an earlier item of the same batch (item_index set).
+Conflict = namedtuple("Conflict", "booking_id item_index teacher_name start_min end_min")
+
+
+def plan(existing, planned, released_ids=()):
+    """Return {index: Conflict} for planned bookings that cannot be written.
+
+    existing      rows (BookingRow-like) already stored for the affected room-days
+    planned       PlannedBooking list, in batch order
+    released_ids  ids of stored bookings this batch moves or deletes; they no
+                  longer block anything
+
+    Items are accepted in batch order, so when two items overlap on a shared
+    date the earlier one wins. Each room-day is checked with the same bisect
+    structure as the in-memory conflict index.
+    """
+    released = set(released_ids)
+    slots = _stored_slots(row for row in existing if row.id not in released)
+
+    rejected = {}
+    for item in planned:
+        day_slots = slots.setdefault((item.classroom_id, item.day), DaySlots())
+        hit = day_slots.find_overlap(item.start_min, item.end_min, clashes=_clashes_with(item))
+        if hit is not None:
+            rejected[item.index] = _conflict(hit)
+            continue
+        day_slots.add(_accepted(item))
+    return rejected
+
+
+def sweep(existing, planned):
+    """Return {index: Conflict} for planned bookings that cannot be imported.
+
+    A sweep over each room-day in start order, for large imports. Stored
+    rules may overlap in time when their dates don't, so they go into one
+    DaySlots per room-day, built once; accepted items arrive in start order
+    and are appended to a second one in O(1). Both are searched with max_end
+    pruning, so there are no per-item re-sorts.
+
+    Unlike plan(), overlapping items are resolved by start time: the one that
+    starts first (then the lower index) wins.
+    """
+    stored = _stored_slots(existing)
+    grouped = {}
+    for item in planned:
+        grouped.setdefault((item.classroom_id, item.day), []).append(item)
+
+    rejected = {}
+    for key, items in grouped.items():
+        rows = stored.get(key, DaySlots())
+        accepted = DaySlots()
+        items.sort(key=lambda p: (p.start_min, p.index))
+        for item in items:
+            clashes = _clashes_with(item)
+            hit = rows.find_overlap(item.start_min, item.end_min, clashes=clashes) or \
+                accepted.find_overlap(item.start_min, item.end_min, clashes=clashes)
+            if hit is not None:
+                rejected[item.index] = _conflict(hit)
+            else:
+                accepted.append(_accepted(item))
+    return rejected
+
+
+def _stored_slots(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault((row.classroom_id, row.day), []).append(to_interval(row))
+    return {key: DaySlots(intervals) for key, intervals in grouped.items()}
+
+
+def _clashes_with(item):
+    return lambda interval: recurrence.clashes(item.day, item, interval)
+
+
+def _accepted(item):
+    # Accepted items are stored with negative ids so they can't clash with real ones
+    return Interval(item.start_min, item.end_min, -(item.index + 1), item.teacher_name,
+                    item.valid_from, item.valid_to, item.exceptions)
+
+
+def _conflict(hit):
+    if hit.id < 0:
+        return Conflict(None, -hit.id - 1, hit.teacher_name, hit.start_min, hit.end_min)
+    return Conflict(hit.id, None, hit.teacher_name, hit.start_min, hit.end_min)
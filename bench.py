@@ -0,0 +1,304 @@
+# bench.py
+# Run: python bench.py [--floors 4] [--requests 200] [--output results.json]
+#      python bench.py --url http://127.0.0.1:8000 --reuse-db   (drive a running gunicorn)
+#
+# Builds a database with the seed_timetable generators (in a temp file unless
+# --reuse-db), drives every route and reports p50/p95/p99 latency, requests/sec
+# and SQL queries per request as JSON, so runs can be compared across commits.
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ACCESS_CODE = "ITDept@2025"
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Latency / throughput benchmark for every route.")
+    parser.add_argument("--floors", type=int, default=4)
+    parser.add_argument("--lectures-per-floor", type=int, default=20)
+    parser.add_argument("--labs-per-floor", type=int, default=6)
+    parser.add_argument("--it-divisions", type=int, default=6)
+    parser.add_argument("--cs-divisions", type=int, default=12)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=2025, help="seeds both the timetable and the request mix")
+    parser.add_argument("--reuse-db", action="store_true",
+                        help="don't build a database; use DATABASE_URL (or the app default) as is")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route")
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads per route")
+    parser.add_argument("--routes",
+                        default="home,book,check_availability,cancel,edit_booking,cancel_booking,move_booking",
+                        help="comma-separated subset of routes to run")
+    parser.add_argument("--url", help="benchmark a running server instead of Flask's test client")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    return parser.parse_args(argv)
+
+
+# ---------------- Database ----------------
+def build_database(args):
+    """Point the app at a fresh temp DB and seed it; returns the DB path."""
+    fd, path = tempfile.mkstemp(prefix="bench-", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    import seed_timetable
+    seed_timetable.seed_database(args.floors, args.lectures_per_floor, args.labs_per_floor, 2,
+                                 args.it_divisions, args.cs_divisions, args.days, args.seed)
+    return path
+
+
+def load_fixtures():
+    """Room names and teacher names the request generators pick from."""
+    from app import app
+    from models import db, Classroom, Booking
+    with app.app_context():
+        rooms = [name for (name,) in db.session.query(Classroom.room_name)]
+        teachers = [name for (name,) in db.session.query(Booking.teacher_name).distinct()]
+        counts = {"rooms": len(rooms), "bookings": Booking.query.count()}
+    return rooms, teachers, counts
+
+
+# ---------------- Request mix ----------------
+# Each scenario returns (method, path, form data) for one request. Requests
+# are generated before they are timed, so setup done here (like creating the
+# booking a cancel_booking request removes) is never measured.
+
+def scenarios(rooms, teachers, rng, driver):
+    def window():
+        start = rng.randrange(8 * 60, 17 * 60, 15)
+        return start, start + rng.choice((30, 60, 120))
+
+    def hhmm(minutes):
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def home():
+        return "GET", "/?" + urllib.parse.urlencode({"room_filter": rng.choice(rooms)}), None
+
+    def book():
+        start, end = window()
+        # Weekend slots so most bookings succeed; some still collide
+        return "POST", "/book", {"teacher": f"Bench {rng.randrange(50)}", "room": rng.choice(rooms),
+                                 "day": rng.choice(("Saturday", "Sunday")), "start": hhmm(start),
+                                 "end": hhmm(end), "code": ACCESS_CODE}
+
+    def check_availability():
+        start, end = window()
+        return "POST", "/check_availability", {"day": rng.choice(DAYS[:5]), "start": hhmm(start),
+                                               "end": hhmm(end)}
+
+    def cancel():
+        return "POST", "/cancel", {"teacher": rng.choice(teachers), "code": ACCESS_CODE,
+                                   "fetch_bookings": "1"}
+
+    def edit_booking():
+        return "POST", "/edit_booking", {"teacher": rng.choice(teachers), "code": ACCESS_CODE}
+
+    def booked():
+        """Create a weekend booking of its own teacher; (id, teacher, day, start, end)."""
+        for _ in range(100):
+            start, end = window()
+            teacher, day = f"Bench {rng.randrange(10 ** 6)}", rng.choice(("Saturday", "Sunday"))
+            booking_id = driver.create_booking({"room": rng.choice(rooms), "teacher": teacher, "day": day,
+                                                "start": hhmm(start), "end": hhmm(end)})
+            if booking_id is not None:
+                return booking_id, teacher, day, start, end
+        raise RuntimeError("no free weekend slot left to set up a booking")
+
+    def cancel_booking():
+        booking_id, teacher, _, _, _ = booked()
+        return "POST", "/cancel", {"teacher": teacher, "code": ACCESS_CODE, "cancel_selected": "1",
+                                   "booking_ids": str(booking_id)}
+
+    def move_booking():
+        booking_id, teacher, day, start, end = booked()
+        # Trimmed inside its own slot, so the move is always written, never refused
+        return "POST", "/edit_booking", {"teacher": teacher, "code": ACCESS_CODE,
+                                         "booking_id": str(booking_id), "new_day": day,
+                                         "new_start": hhmm(start), "new_end": hhmm(end - 15)}
+
+    return {"home": home, "book": book, "check_availability": check_availability,
+            "cancel": cancel, "edit_booking": edit_booking,
+            "cancel_booking": cancel_booking, "move_booking": move_booking}
+
+
+def created_id(payload):
+    """The id /api/bookings gave a single created booking, or None if it was refused."""
+    result = (payload or {}).get("results", [{}])[0]
+    return result.get("id") if result.get("status") == "created" else None
+
+
+# ---------------- Clients ----------------
+class TestClientDriver:
+    """In-process driver; also counts SQL statements per request."""
+
+    def __init__(self):
+        from app import app
+        from models import db
+        from sqlalchemy import event
+        self.app = app
+        self._local = threading.local()
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+
+    def request(self, method, path, data):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        self._local.queries = 0
+        response = client.open(path, method=method, data=data)
+        return response.status_code, self._local.queries
+
+    def create_booking(self, item):
+        response = self.app.test_client().post("/api/bookings", json={"bookings": [item]},
+                                               headers={"X-Access-Code": ACCESS_CODE})
+        return created_id(response.get_json())
+
+
+class HttpDriver:
+    """Drives a running server; SQL counts aren't visible from outside."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def create_booking(self, item):
+        req = urllib.request.Request(self.base_url + "/api/bookings", method="POST",
+                                     data=json.dumps({"bookings": [item]}).encode(),
+                                     headers={"Content-Type": "application/json", "X-Access-Code": ACCESS_CODE})
+        try:
+            with urllib.request.urlopen(req) as response:
+                return created_id(json.load(response))
+        except urllib.error.HTTPError as e:
+            return created_id(json.load(e))
+
+
+# ---------------- Measurement ----------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_route(driver, make_request, requests, warmup, concurrency):
+    for _ in range(warmup):
+        driver.request(*make_request())
+
+    lock = threading.Lock()
+    planned = [make_request() for _ in range(requests)]   # generate up front: rng isn't thread-safe
+    latencies, queries, statuses = [], [], {}
+
+    def one(req):
+        started = time.perf_counter()
+        status, count = driver.request(*req)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed * 1000)
+            if count is not None:
+                queries.append(count)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, planned))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    errors = sum(n for code, n in statuses.items() if int(code) >= 500)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "status_counts": statuses,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "rps": round(requests / wall, 1),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault("PURGE_INTERVAL_SECONDS", "0")   # keep background writes out of the numbers
+    db_path = None if args.reuse_db else build_database(args)
+    try:
+        rooms, teachers, counts = load_fixtures()
+        driver = HttpDriver(args.url) if args.url else TestClientDriver()
+        rng = random.Random(args.seed)
+        mix = scenarios(rooms, teachers, rng, driver)
+
+        results = {}
+        for name in args.routes.split(","):
+            name = name.strip()
+            if name not in mix:
+                sys.exit(f"unknown route {name!r}; choose from {', '.join(mix)}")
+            print(f"benchmarking {name} ...", file=sys.stderr)
+            results[name] = run_route(driver, mix[name], args.requests, args.warmup, args.concurrency)
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "driver": "http" if args.url else "test_client",
+                "url": args.url,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "database": {**counts, "floors": args.floors, "it_divisions": args.it_divisions,
+                             "cs_divisions": args.cs_divisions, "days": args.days,
+                             "reused": args.reuse_db},
+            },
+            "routes": results,
+        }
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+    finally:
+        if db_path:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+
+if __name__ == "__main__":
+    main()
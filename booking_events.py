@@ -0,0 +1,224 @@
+# booking_events.py
+# Captures committed Booking writes and hands them to in-process listeners
+# (interval index, occupancy grid, ...) so they never have to re-query the DB.
+#
+# Every change is also appended to the booking_log table in the same
+# transaction. Each app (see init_app) remembers the last log seq its
+# listeners reflect and sync() replays newer entries, so writes made by other
+# gunicorn workers reach this worker's caches too.
+
+from collections import namedtuple
+import logging
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, insert, select, delete
+
+from models import db, Booking, BookingLog
+import utilization
+
+log = logging.getLogger(__name__)
+
+# Plain snapshot of a Booking row; safe to keep after the session is gone.
+# valid_from / valid_to / except_dates are the recurrence columns (see models.Booking).
+BookingRow = namedtuple(
+    "BookingRow", "id classroom_id teacher_name day start_min end_min valid_from valid_to except_dates",
+    defaults=(None, None, None)
+)
+
+# op is "insert", "update" or "delete"; old is the pre-update row for updates.
+BookingChange = namedtuple("BookingChange", "op row old")
+
+# Booking columns in BookingRow order, for selects and RETURNING clauses.
+ROW_COLUMNS = [getattr(Booking, field) for field in BookingRow._fields]
+
+# Beyond this many changes a full reload is cheaper than applying them one by one.
+MAX_REPLAY = 1000
+
+def init_app(app):
+    """Give app its own BookingEvents, so apps on different databases never share caches."""
+    hub = app.extensions["booking_events"] = BookingEvents()
+    return hub
+
+
+def current():
+    """The current app's BookingEvents, or None outside an app made by create_app."""
+    return current_app.extensions.get("booking_events") if has_app_context() else None
+
+
+class BookingEvents:
+    """One app's listeners and the booking_log position they reflect."""
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._seen_seq = None    # last booking_log seq the listeners reflect; None until loaded
+
+    def subscribe(self, listener):
+        """Register an object with apply(changes) and rebuild(rows) methods."""
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def publish(self, changes):
+        """Send committed changes to every listener (used by bulk SQL writers too).
+
+        The changes are already committed, so a failing listener must not fail
+        the request: it is logged, the rest still get the changes, and the next
+        sync() rebuilds every listener from the DB.
+        """
+        if not changes:
+            return
+        with self._lock:
+            for listener in self._listeners:
+                self._call(listener.apply, changes)
+
+    def rebuild_all(self, rows):
+        """Replace every listener's state with a full list of BookingRow."""
+        rows = list(rows)
+        with self._lock:
+            for listener in self._listeners:
+                self._call(listener.rebuild, rows)
+
+    def sync(self, session, max_replay=MAX_REPLAY):
+        """Bring listeners up to date with booking_log; one cheap query when current."""
+        with self._lock:
+            latest = session.execute(select(func.max(BookingLog.seq))).scalar() or 0
+            seen = self._seen_seq
+            if seen == latest:
+                return
+            if seen is None or latest < seen or latest - seen > max_replay:
+                self.reload(session)
+                return
+            entries = session.execute(
+                select(BookingLog).where(BookingLog.seq > seen).order_by(BookingLog.seq)
+            ).scalars().all()
+            if not entries or entries[0].seq != seen + 1:
+                self.reload(session)  # entries we needed were pruned
+                return
+            self._seen_seq = entries[-1].seq  # before publishing, so a failing listener can reset it
+            self.publish([_change_from_log(entry) for entry in entries])
+
+    def reload(self, session):
+        """Rebuild every listener from the Booking table."""
+        with self._lock:
+            latest = session.execute(select(func.max(BookingLog.seq))).scalar() or 0
+            rows = session.execute(select(*ROW_COLUMNS)).all()
+            self._seen_seq = latest
+            self.rebuild_all(BookingRow(*r) for r in rows)
+
+    def current_seq(self):
+        """Last booking_log seq this app reflects (0 before anything is loaded)."""
+        return self._seen_seq or 0
+
+    def committed(self, changes, span):
+        """Hand a committed transaction's changes to the listeners (after_commit hook)."""
+        with self._lock:
+            if changes and len(changes) > MAX_REPLAY:
+                self._seen_seq = None    # bulk write: the next sync() reloads instead
+                return
+            self.publish(changes)
+            # Skip our own entries on the next sync unless another worker wrote in between
+            if span and self._seen_seq == span[0] - 1:
+                self._seen_seq = span[1]
+
+    def _call(self, method, argument):
+        try:
+            method(argument)
+        except Exception:
+            log.exception("booking listener %r failed; caches will be reloaded", method.__self__)
+            self._seen_seq = None
+
+
+def record(session, changes):
+    """Log changes made in session's transaction; listeners get them on commit.
+
+    The session hooks below call this for ORM writes; bulk SQL writers call it
+    themselves with the rows they changed. The room_utilization aggregate is
+    updated here too, in the same transaction.
+    """
+    if not changes:
+        return
+    session.info.setdefault("booking_changes", []).extend(changes)
+    connection = session.connection()
+    connection.execute(insert(BookingLog.__table__), [_log_entry(c) for c in changes])
+    utilization.apply(connection, changes)
+    # The transaction holds SQLite's write lock, so these seqs are contiguous
+    last = connection.execute(select(func.max(BookingLog.seq))).scalar()
+    span = session.info.get("booking_log_span")
+    session.info["booking_log_span"] = (span[0] if span else last - len(changes) + 1, last)
+
+
+def prune_log(session, keep):
+    """Drop all but the newest `keep` log entries. Caller commits."""
+    latest = session.execute(select(func.max(BookingLog.seq))).scalar() or 0
+    session.execute(delete(BookingLog).where(BookingLog.seq <= latest - keep))
+
+
+def snapshot(booking):
+    return BookingRow(*(getattr(booking, field) for field in BookingRow._fields))
+
+
+def _log_entry(change):
+    entry = dict(op=change.op, booking_id=change.row.id, **change.row._asdict())
+    del entry["id"]
+    if change.old is not None:
+        entry.update(old_classroom_id=change.old.classroom_id, old_teacher_name=change.old.teacher_name,
+                     old_day=change.old.day, old_start_min=change.old.start_min,
+                     old_end_min=change.old.end_min)
+    return entry
+
+
+def _change_from_log(entry):
+    row = BookingRow(entry.booking_id, entry.classroom_id, entry.teacher_name,
+                     entry.day, entry.start_min, entry.end_min,
+                     entry.valid_from, entry.valid_to, entry.except_dates)
+    old = None
+    if entry.old_classroom_id is not None:
+        old = BookingRow(entry.booking_id, entry.old_classroom_id, entry.old_teacher_name,
+                         entry.old_day, entry.old_start_min, entry.old_end_min)
+    return BookingChange(entry.op, row, old)
+
+
+def _previous_snapshot(booking):
+    """Row as it was before the pending update, using attribute history."""
+    state = inspect(booking)
+    values = {}
+    for field in BookingRow._fields:
+        hist = state.attrs[field].history
+        values[field] = hist.deleted[0] if hist.deleted else getattr(booking, field)
+    return BookingRow(**values)
+
+
+# ---------------- Session hooks ----------------
+# Changes are collected at flush time (while attribute history is still
+# available) and only published once the transaction actually commits.
+
+@event.listens_for(db.session, "after_flush")
+def _collect_changes(session, flush_context):
+    flushed = []
+    for obj in session.new:
+        if isinstance(obj, Booking):
+            flushed.append(BookingChange("insert", snapshot(obj), None))
+    for obj in session.dirty:
+        if isinstance(obj, Booking) and session.is_modified(obj, include_collections=False):
+            flushed.append(BookingChange("update", snapshot(obj), _previous_snapshot(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Booking):
+            flushed.append(BookingChange("delete", _previous_snapshot(obj), None))
+    record(session, flushed)
+
+
+@event.listens_for(db.session, "after_commit")
+def _publish_changes(session):
+    changes = session.info.pop("booking_changes", None)
+    span = session.info.pop("booking_log_span", None)
+    hub = current()
+    if hub is not None:
+        hub.committed(changes, span)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    session.info.pop("booking_changes", None)
+    session.info.pop("booking_log_span", None)
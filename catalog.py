@@ -0,0 +1,95 @@
+# catalog.py
+# Read-mostly, in-memory copy (one per app) of the classroom table.
+#
+# Rooms almost never change, so routes read them from an immutable snapshot
+# instead of querying Classroom. Any flush that touches a Classroom writes a
+# new stamp to catalog_version in the same transaction; sync() compares that
+# one value with the snapshot's and reloads only when they differ, which is
+# how other workers notice.
+
+from collections import namedtuple
+from types import MappingProxyType
+import threading
+import uuid
+
+from sqlalchemy import event, insert, select, update
+
+from models import db, Classroom, CatalogVersion
+
+# Plain copy of a Classroom row; attribute names match so templates don't care.
+RoomInfo = namedtuple("RoomInfo", "id room_name room_type capacity")
+
+# rooms is sorted by name (dropdown order); the mappings are read-only views.
+# generation counts reloads in this process, a cheap key for caches built on it.
+Snapshot = namedtuple("Snapshot", "stamp generation rooms by_id by_name room_types")
+
+EMPTY = Snapshot(None, 0, (), MappingProxyType({}), MappingProxyType({}), ())
+
+
+class ClassroomCatalog:
+    """Every classroom, swapped as a whole when the catalog_version stamp moves."""
+
+    def __init__(self):
+        self._snapshot = EMPTY
+        self._lock = threading.Lock()
+
+    def sync(self, session):
+        """Reload if another process (or this one) changed the rooms; one tiny query."""
+        stamp = session.execute(select(CatalogVersion.stamp).where(CatalogVersion.id == 1)).scalar()
+        if not self._snapshot.generation or self._snapshot.stamp != stamp:
+            self.reload(session, stamp)
+
+    def reload(self, session, stamp=None):
+        with self._lock:
+            rows = session.execute(select(
+                Classroom.id, Classroom.room_name, Classroom.room_type, Classroom.capacity
+            ).order_by(Classroom.room_name)).all()
+            rooms = tuple(RoomInfo(*r) for r in rows)
+            self._snapshot = Snapshot(
+                stamp, self._snapshot.generation + 1, rooms,
+                MappingProxyType({r.id: r for r in rooms}),
+                MappingProxyType({r.room_name: r for r in rooms}),
+                tuple(sorted({r.room_type for r in rooms if r.room_type})),
+            )
+
+    # -- queries (all answered from the current snapshot) --
+
+    @property
+    def generation(self):
+        return self._snapshot.generation
+
+    @property
+    def rooms(self):
+        return self._snapshot.rooms
+
+    @property
+    def room_types(self):
+        return self._snapshot.room_types
+
+    @property
+    def by_id(self):
+        return self._snapshot.by_id
+
+    def get(self, classroom_id):
+        return self._snapshot.by_id.get(classroom_id)
+
+    def find(self, room_name):
+        return self._snapshot.by_name.get(room_name)
+
+
+def bump(session):
+    """Give the catalog a new stamp; bulk SQL writers to classroom call this themselves."""
+    stamp = uuid.uuid4().hex
+    connection = session.connection()
+    if not connection.execute(update(CatalogVersion).where(CatalogVersion.id == 1).values(stamp=stamp)).rowcount:
+        connection.execute(insert(CatalogVersion).values(id=1, stamp=stamp))
+
+
+@event.listens_for(db.session, "after_flush")
+def _bump_on_room_change(session, flush_context):
+    changed = any(isinstance(obj, Classroom) for obj in session.new) or \
+        any(isinstance(obj, Classroom) for obj in session.deleted) or \
+        any(isinstance(obj, Classroom) and session.is_modified(obj, include_collections=False)
+            for obj in session.dirty)
+    if changed:
+        bump(session)
@@ -0,0 +1,134 @@
+# export.py
+# Streams schedules as iCalendar (one weekly recurring event per booking rule,
+# with its UNTIL and EXDATEs; a single event for one-offs) or CSV. Rows are
+# written as they come off the cursor, so memory use doesn't grow with the
+# size of the export.
+
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+import csv
+import io
+
+from models import format_minutes, DAYS
+import recurrence
+
+TIMEZONE = "Asia/Kolkata"
+BYDAY = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+UTC_OFFSET = timedelta(hours=5, minutes=30)
+CSV_HEADER = ["room", "room_type", "day", "start", "end", "teacher",
+              "valid_from", "valid_to", "except_dates"]
+# One exported booking, with its room's name and type filled in.
+ExportRow = namedtuple("ExportRow", "id teacher_name day start_min end_min created_at "
+                                    "valid_from valid_to except_dates room_name room_type")
+
+# Used when a (migrated) booking has no created_at to anchor its first occurrence.
+FALLBACK_ANCHOR = datetime(2025, 1, 6)
+
+# India has no daylight saving, so one STANDARD block describes the zone.
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TIMEZONE}",
+    "BEGIN:STANDARD",
+    "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0530",
+    "TZOFFSETTO:+0530",
+    "TZNAME:IST",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+
+def ics_escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not parts else 74), len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1    # don't cut a UTF-8 sequence in half
+        parts.append(data[start:end].decode("utf-8"))
+        start = end
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def first_occurrence(day, created_at):
+    """Date of the first `day` (0 = Monday) on or after the booking was made."""
+    anchor = (created_at or FALLBACK_ANCHOR).date()
+    return anchor + timedelta((day - anchor.weekday()) % 7)
+
+
+def local_time(date, minutes):
+    return f"{date:%Y%m%d}T{minutes // 60:02d}{minutes % 60:02d}00"
+
+
+def ics_event(row, host):
+    if row.valid_from:
+        date = recurrence.first_on_or_after(row.day, row.valid_from)
+    else:
+        date = first_occurrence(row.day, row.created_at)
+    stamp = (row.created_at or FALLBACK_ANCHOR).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:booking-{row.id}@{host}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;TZID={TIMEZONE}:{local_time(date, row.start_min)}",
+        f"DTEND;TZID={TIMEZONE}:{local_time(date, row.end_min)}",
+    ]
+    once = row.valid_from is not None and row.valid_from == row.valid_to
+    if not once:
+        rrule = f"RRULE:FREQ=WEEKLY;BYDAY={BYDAY[row.day]}"
+        if row.valid_to:
+            # With a TZID start, UNTIL must be in UTC: the end of valid_to, local time
+            until = datetime.combine(row.valid_to, time(23, 59, 59)) - UTC_OFFSET
+            rrule += f";UNTIL={until:%Y%m%dT%H%M%SZ}"
+        lines.append(rrule)
+        exceptions = sorted(recurrence.parse_dates(row.except_dates))
+        if exceptions:
+            lines.append(f"EXDATE;TZID={TIMEZONE}:"
+                         + ",".join(local_time(d, row.start_min) for d in exceptions))
+    lines += [
+        f"SUMMARY:{ics_escape(row.teacher_name)}",
+        f"LOCATION:{ics_escape(row.room_name)}",
+        "END:VEVENT",
+    ]
+    return "".join(fold(line) for line in lines)
+
+
+def stream_ics(rows, calendar_name, host):
+    """Yield an iCalendar document, one chunk per booking."""
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Classroom Finder//Timetable Export//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{ics_escape(calendar_name)}",
+        f"X-WR-TIMEZONE:{TIMEZONE}",
+    ] + VTIMEZONE
+    yield "".join(fold(line) for line in header)
+    for row in rows:
+        yield ics_event(row, host)
+    yield fold("END:VCALENDAR")
+
+
+def stream_csv(rows, chunk_rows=500):
+    """Yield CSV text in chunks of `chunk_rows` bookings."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([row.room_name, row.room_type, DAYS[row.day],
+                         format_minutes(row.start_min), format_minutes(row.end_min),
+                         row.teacher_name, row.valid_from or "", row.valid_to or "",
+                         row.except_dates or ""])
+        if i % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
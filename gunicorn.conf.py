@@ -0,0 +1,34 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn app:app` (see Procfile).
+#
+# The app is imported once in the master (preload_app) and workers fork from
+# it; create_app() does no database I/O, so nothing is shared across the fork.
+#
+# gevent workers keep hundreds of idle /events streams cheap, but the sqlite3
+# driver is C code gevent can't patch: while a query runs, or SQLite's busy
+# handler waits for the write lock, every greenlet in that worker is stalled.
+# Reads under WAL never wait, so the cost falls on writes. Under gevent the
+# busy timeout is therefore cut to 100 ms and a write that still finds the
+# database locked is retried by atomic_write, whose backoff sleep does yield;
+# that also lets a greenlet of the same worker holding the lock finish. Set
+# GUNICORN_WORKER_CLASS=gthread for write-heavy deployments that don't need
+# many open /events streams; the SQLITE_BUSY_TIMEOUT_MS / WRITE_RETRIES
+# environment variables override both defaults.
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = 1000
+threads = int(os.environ.get("GUNICORN_THREADS", 4))   # used by the gthread worker only
+preload_app = True
+
+if worker_class == "gevent":
+    # Patch before the app is preloaded so the locks and queues it creates
+    # at import are cooperative.
+    from gevent import monkey
+    monkey.patch_all()
+    # Block the hub for at most 100 ms per attempt; wait out the rest in yielding retries.
+    os.environ.setdefault("SQLITE_BUSY_TIMEOUT_MS", "100")
+    os.environ.setdefault("WRITE_RETRIES", "8")
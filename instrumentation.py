@@ -0,0 +1,157 @@
+# instrumentation.py
+# Opt-in per-request timing: SQL count/time, template render time and total
+# time, sent as a Server-Timing header, exported Prometheus-style at /metrics
+# and logged with the query list for slow requests.
+#
+# Metrics live in process memory, so with several gunicorn workers each
+# scrape of /metrics sees the worker that happened to answer it.
+
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request, Response, before_render_template, template_rendered
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name, self.help_text = name, help_text
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, buckets
+        self.series = {}        # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, [0] * len(self.buckets) + [0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(labels)} {series[-1]}")
+        return lines
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Instrumentation:
+    """Hooks SQLAlchemy engine events and Flask request/template signals."""
+
+    def __init__(self, slow_request_ms=500):
+        self.slow_request_ms = slow_request_ms
+        self._lock = threading.Lock()
+        self.requests = Counter("classroom_http_requests_total", "HTTP requests by endpoint and status.")
+        self.duration = Histogram("classroom_http_request_duration_seconds",
+                                  "Total request time.", DURATION_BUCKETS)
+        self.db_time = Histogram("classroom_db_time_seconds",
+                                 "Time spent in SQL per request.", DURATION_BUCKETS)
+        self.render_time = Histogram("classroom_render_time_seconds",
+                                     "Time spent rendering templates per request.", DURATION_BUCKETS)
+        self.queries = Histogram("classroom_db_queries_per_request",
+                                 "SQL statements per request.", QUERY_BUCKETS)
+
+    def init_app(self, app, engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    # -- SQL --
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "timing" in g:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started or not has_request_context() or "timing" not in g:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        g.timing["db"] += elapsed
+        g.timing["queries"].append((elapsed, statement))
+
+    # -- templates --
+
+    def _before_render(self, sender, template, context, **extra):
+        if "timing" in g:
+            g.timing["render_started"] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        if "timing" in g and g.timing.get("render_started"):
+            g.timing["render"] += time.perf_counter() - g.timing.pop("render_started")
+
+    # -- requests --
+
+    def _start_request(self):
+        g.timing = {"start": time.perf_counter(), "db": 0.0, "render": 0.0, "queries": []}
+
+    def _finish_request(self, response):
+        timing = g.pop("timing", None)
+        if timing is None:
+            return response
+        total = time.perf_counter() - timing["start"]
+        endpoint = request.endpoint or "unmatched"
+        labels = (("endpoint", endpoint),)
+
+        with self._lock:
+            self.requests.inc(labels + (("method", request.method), ("status", response.status_code)))
+            self.duration.observe(labels, total)
+            self.db_time.observe(labels, timing["db"])
+            self.render_time.observe(labels, timing["render"])
+            self.queries.observe(labels, len(timing["queries"]))
+
+        response.headers["Server-Timing"] = (
+            f'db;dur={timing["db"] * 1000:.2f};desc="{len(timing["queries"])} queries", '
+            f'render;dur={timing["render"] * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+        if total * 1000 >= self.slow_request_ms:
+            query_list = "\n".join(f"  {elapsed * 1000:8.2f} ms  {' '.join(statement.split())}"
+                                   for elapsed, statement in timing["queries"])
+            log.warning("slow request %s %s: %.1f ms total, %.1f ms in %d queries, %.1f ms rendering\n%s",
+                        request.method, request.full_path, total * 1000, timing["db"] * 1000,
+                        len(timing["queries"]), timing["render"] * 1000, query_list)
+        return response
+
+    # -- exposition --
+
+    def metrics_view(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.db_time, self.render_time, self.queries):
+                lines.extend(metric.render())
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,146 @@
+# interval_index.py
+# Per-room, per-day sorted interval index used for booking conflict checks.
+
+from bisect import bisect_left, insort
+from collections import namedtuple
+import threading
+
+import recurrence
+
+# Field names mirror Booking so callers can use a hit like a booking (and a
+# recurrence rule: exceptions is the parsed set of skipped dates).
+Interval = namedtuple("Interval", "start_min end_min id teacher_name valid_from valid_to exceptions",
+                      defaults=(None, None, frozenset()))
+
+
+class DaySlots:
+    """Intervals of one room on one day, sorted by start minute.
+
+    max_end[i] is the latest end among intervals[0..i], which lets a query
+    stop scanning as soon as nothing further left can reach its start.
+    """
+
+    __slots__ = ("intervals", "starts", "max_end")
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals)
+        self._reindex()
+
+    def add(self, interval):
+        insort(self.intervals, interval)
+        self._reindex()
+
+    def append(self, interval):
+        """Add an interval starting no earlier than any held now, in O(1)."""
+        self.intervals.append(interval)
+        self.starts.append(interval.start_min)
+        self.max_end.append(max(self.max_end[-1], interval.end_min) if self.max_end else interval.end_min)
+
+    def remove(self, booking_id):
+        self.intervals = [iv for iv in self.intervals if iv.id != booking_id]
+        self._reindex()
+
+    def _reindex(self):
+        self.starts = [iv.start_min for iv in self.intervals]
+        self.max_end = []
+        latest = -1
+        for iv in self.intervals:
+            latest = max(latest, iv.end_min)
+            self.max_end.append(latest)
+
+    def find_overlap(self, start, end, exclude_id=None, clashes=None):
+        """First interval overlapping [start, end) for which clashes(interval), if given, is true."""
+        # Only intervals starting before `end` can overlap [start, end).
+        i = bisect_left(self.starts, end) - 1
+        while i >= 0 and self.max_end[i] > start:
+            iv = self.intervals[i]
+            if iv.end_min > start and iv.id != exclude_id and (clashes is None or clashes(iv)):
+                return iv
+            i -= 1
+        return None
+
+
+class IntervalIndex:
+    """In-process index of bookings keyed by (classroom_id, day).
+
+    Kept current through booking_events; each process holds its own copy.
+    """
+
+    def __init__(self):
+        self._slots = {}
+        self._where = {}        # booking id -> (classroom_id, day)
+        self._lock = threading.Lock()
+
+    # -- booking_events listener API --
+
+    def rebuild(self, rows):
+        slots = {}
+        where = {}
+        for row in rows:
+            key = (row.classroom_id, row.day)
+            slots.setdefault(key, []).append(to_interval(row))
+            where[row.id] = key
+        built = {key: DaySlots(intervals) for key, intervals in slots.items()}
+        with self._lock:
+            self._slots = built
+            self._where = where
+
+    def apply(self, changes):
+        with self._lock:
+            for change in changes:
+                self._discard(change.row.id)
+                if change.op != "delete":
+                    self._add(change.row)
+
+    # -- queries --
+
+    def find_conflict(self, classroom_id, day, start, end, exclude_id=None, rule=recurrence.ALWAYS):
+        """Return an Interval overlapping [start, end) (minutes) on a date of `rule`, or None.
+
+        Rules are compared directly (recurrence.clashes); no dates are expanded.
+        """
+        with self._lock:
+            day_slots = self._slots.get((classroom_id, day))
+            if day_slots is None:
+                return None
+            return day_slots.find_overlap(start, end, exclude_id,
+                                          lambda iv: recurrence.clashes(day, rule, iv))
+
+    def intervals(self, classroom_id, day):
+        with self._lock:
+            day_slots = self._slots.get((classroom_id, day))
+            return list(day_slots.intervals) if day_slots else []
+
+    def intervals_for(self, classroom_id, day, rule):
+        """Intervals of a room-day that share at least one date with `rule`."""
+        return [iv for iv in self.intervals(classroom_id, day) if recurrence.clashes(day, rule, iv)]
+
+    def intervals_on(self, classroom_id, date):
+        """Intervals of a room that actually occur on `date`."""
+        day = date.weekday()
+        return [iv for iv in self.intervals(classroom_id, day) if recurrence.occurs_on(iv, day, date)]
+
+    def occurrences(self, classroom_id, start, end):
+        """Lazily expanded Occurrences of a room's bookings from start to end (dates), in order."""
+        return recurrence.expand(((day, iv) for day in range(7) for iv in self.intervals(classroom_id, day)),
+                                 start, end)
+
+    # -- internals --
+
+    def _add(self, row):
+        key = (row.classroom_id, row.day)
+        self._slots.setdefault(key, DaySlots()).add(to_interval(row))
+        self._where[row.id] = key
+
+    def _discard(self, booking_id):
+        key = self._where.pop(booking_id, None)
+        if key is not None and key in self._slots:
+            self._slots[key].remove(booking_id)
+            if not self._slots[key].intervals:
+                del self._slots[key]
+
+
+def to_interval(row):
+    """Interval for a BookingRow-like row (except_dates as stored, comma-separated)."""
+    return Interval(row.start_min, row.end_min, row.id, row.teacher_name,
+                    row.valid_from, row.valid_to, recurrence.parse_dates(row.except_dates))
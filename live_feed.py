@@ -0,0 +1,113 @@
+# live_feed.py
+# Fans committed booking changes out to the Server-Sent Events streams open in
+# this process. Changes made by other gunicorn workers arrive through
+# booking_events.sync(), which a background task runs while anyone listens.
+
+from collections import namedtuple
+import json
+import queue
+import threading
+
+from models import format_minutes, DAYS
+
+# name is the SSE event name; data is JSON-serialisable.
+FeedEvent = namedtuple("FeedEvent", "name data")
+
+EVENT_NAMES = {"insert": "booking-created", "update": "booking-updated", "delete": "booking-cancelled"}
+RELOAD = FeedEvent("reload", {})
+
+
+def booking_json(row):
+    return {
+        "id": row.id,
+        "classroom_id": row.classroom_id,
+        "teacher": row.teacher_name,
+        "day": DAYS[row.day],
+        "start": format_minutes(row.start_min),
+        "end": format_minutes(row.end_min),
+        "valid_from": row.valid_from.isoformat() if row.valid_from else None,
+        "valid_to": row.valid_to.isoformat() if row.valid_to else None,
+        "except_dates": row.except_dates.split(",") if row.except_dates else [],
+    }
+
+
+def format_sse(event):
+    return f"event: {event.name}\ndata: {json.dumps(event.data)}\n\n"
+
+
+class Subscription:
+    """One open stream: a bounded queue of events for one room (or all rooms).
+
+    A client that stops reading doesn't hold events forever; once its queue
+    fills up it is told to reload instead.
+    """
+
+    def __init__(self, classroom_id=None, maxsize=100):
+        self.classroom_id = classroom_id
+        self._queue = queue.Queue(maxsize)
+        self._overflowed = False
+
+    def wants(self, classroom_ids):
+        return self.classroom_id is None or self.classroom_id in classroom_ids
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._overflowed = True
+
+    def get(self, timeout):
+        """Next event, RELOAD after an overflow, or None after `timeout` seconds."""
+        if self._overflowed:
+            self._overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return RELOAD
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LiveFeed:
+    """booking_events listener that turns changes into per-room feed events."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, classroom_id=None):
+        subscription = Subscription(classroom_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    # -- booking_events listener API --
+
+    def rebuild(self, rows):
+        # A full reload means deltas were missed; pages must re-fetch.
+        self._broadcast(RELOAD, None)
+
+    def apply(self, changes):
+        for change in changes:
+            data = booking_json(change.row)
+            rooms = {change.row.classroom_id}
+            if change.old is not None:
+                data["old"] = booking_json(change.old)
+                rooms.add(change.old.classroom_id)
+            self._broadcast(FeedEvent(EVENT_NAMES[change.op], data), rooms)
+
+    def _broadcast(self, event, classroom_ids):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if classroom_ids is None or subscription.wants(classroom_ids):
+                subscription.put(event)
@@ -0,0 +1,194 @@
+# migrate_db.py
+# Run: python migrate_db.py [path/to/database.db ...]   (defaults to instance/*.db)
+# Upgrades existing SQLite databases in place. Each step runs in its own
+# transaction and PRAGMA user_version records the last one applied, so the
+# script is safe to run repeatedly.
+
+import glob
+import os
+import sqlite3
+import sys
+
+from models import day_index, to_minutes
+from utilization import REBUILD_SQL, current_week
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# ---------------- 1: integer day / minute columns + indexes ----------------
+BOOKING_V1 = """
+CREATE TABLE booking (
+	id INTEGER NOT NULL,
+	classroom_id INTEGER NOT NULL,
+	teacher_name VARCHAR(100) NOT NULL,
+	day INTEGER NOT NULL,
+	start_min INTEGER NOT NULL,
+	end_min INTEGER NOT NULL,
+	created_at DATETIME,
+	PRIMARY KEY (id),
+	FOREIGN KEY(classroom_id) REFERENCES classroom (id)
+)"""
+
+
+def booking_minutes_schema(conn):
+    """Booking.day 'Monday' -> 0 and 'HH:MM' times -> minutes after midnight."""
+    if "capacity" not in columns(conn, "classroom"):
+        conn.execute("ALTER TABLE classroom ADD COLUMN capacity INTEGER DEFAULT 0")
+
+    cols = columns(conn, "booking")
+    if cols and "start_min" not in cols:
+        if "classroom_id" in cols:
+            old_rows = conn.execute(
+                "SELECT id, classroom_id, teacher_name, day, start_time, end_time, created_at"
+                " FROM booking"
+            ).fetchall()
+        else:
+            # Oldest layout stored the room name and a `teacher` column.
+            old_rows = conn.execute(
+                "SELECT b.id, c.id, b.teacher, b.day, b.start_time, b.end_time, NULL"
+                " FROM booking b LEFT JOIN classroom c ON c.room_name = b.room_name"
+            ).fetchall()
+
+        new_rows = []
+        for bid, classroom_id, teacher, day, start, end, created_at in old_rows:
+            try:
+                if classroom_id is None:
+                    raise ValueError("unknown classroom")
+                new_rows.append((bid, classroom_id, teacher, day_index(day),
+                                 to_minutes(start), to_minutes(end), created_at))
+            except ValueError as e:
+                print(f"  skipping booking {bid}: {e}")
+
+        conn.execute("DROP TABLE booking")
+        conn.execute(BOOKING_V1)
+        conn.executemany("INSERT INTO booking VALUES (?, ?, ?, ?, ?, ?, ?)", new_rows)
+        print(f"  converted {len(new_rows)} of {len(old_rows)} bookings")
+    elif not cols:
+        conn.execute(BOOKING_V1)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_booking_room_day_start"
+                 " ON booking (classroom_id, day, start_min)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_booking_teacher_name ON booking (teacher_name)")
+
+
+# ---------------- 2: recurrence columns ----------------
+def booking_recurrence_schema(conn):
+    """Booking valid_from / valid_to / except_dates (existing rows become open-ended weekly rules)."""
+    for table in ("booking", "booking_log"):
+        cols = columns(conn, table)
+        for name, kind in (("valid_from", "DATE"), ("valid_to", "DATE"), ("except_dates", "TEXT")):
+            if cols and name not in cols:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+
+# ---------------- 3: room utilization aggregate ----------------
+ROOM_UTILIZATION = """
+CREATE TABLE IF NOT EXISTS room_utilization (
+	classroom_id INTEGER NOT NULL,
+	day INTEGER NOT NULL,
+	hour INTEGER NOT NULL,
+	minutes INTEGER NOT NULL,
+	bookings INTEGER NOT NULL,
+	PRIMARY KEY (classroom_id, day, hour)
+)"""
+
+
+def room_utilization_schema(conn):
+    """room_utilization table (filled by step 4)."""
+    conn.execute(ROOM_UTILIZATION)
+
+
+# ---------------- 4: utilization counts one week ----------------
+UTILIZATION_WEEK = """
+CREATE TABLE IF NOT EXISTS utilization_week (
+	id INTEGER NOT NULL,
+	week DATE NOT NULL,
+	PRIMARY KEY (id)
+)"""
+
+
+def utilization_week_schema(conn):
+    """utilization_week table; room_utilization recounted for this week's bookings only."""
+    week = current_week().isoformat()
+    conn.execute(UTILIZATION_WEEK)
+    conn.execute("DELETE FROM room_utilization")
+    conn.execute(REBUILD_SQL, {"week": week})
+    conn.execute("DELETE FROM utilization_week")
+    conn.execute("INSERT INTO utilization_week (id, week) VALUES (1, ?)", (week,))
+
+
+# ---------------- 5: change feed and catalog version ----------------
+BOOKING_LOG = """
+CREATE TABLE IF NOT EXISTS booking_log (
+	seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+	op VARCHAR(10) NOT NULL,
+	booking_id INTEGER NOT NULL,
+	classroom_id INTEGER NOT NULL,
+	teacher_name VARCHAR(100) NOT NULL,
+	day INTEGER NOT NULL,
+	start_min INTEGER NOT NULL,
+	end_min INTEGER NOT NULL,
+	valid_from DATE,
+	valid_to DATE,
+	except_dates TEXT,
+	old_classroom_id INTEGER,
+	old_teacher_name VARCHAR(100),
+	old_day INTEGER,
+	old_start_min INTEGER,
+	old_end_min INTEGER,
+	created_at DATETIME
+)"""
+
+CATALOG_VERSION = """
+CREATE TABLE IF NOT EXISTS catalog_version (
+	id INTEGER NOT NULL,
+	stamp VARCHAR(32) NOT NULL,
+	PRIMARY KEY (id)
+)"""
+
+
+def change_feed_schema(conn):
+    """booking_log (replayed by every worker's caches) and catalog_version (its first bump adds the row)."""
+    conn.execute(BOOKING_LOG)
+    conn.execute(CATALOG_VERSION)
+
+
+MIGRATIONS = [
+    (1, booking_minutes_schema),
+    (2, booking_recurrence_schema),
+    (3, room_utilization_schema),
+    (4, utilization_week_schema),
+    (5, change_feed_schema),
+]
+
+
+def migrate(path):
+    conn = sqlite3.connect(path)
+    conn.isolation_level = None  # explicit BEGIN/COMMIT so DDL is transactional too
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, step in MIGRATIONS:
+            if version >= target:
+                continue
+            print(f"{path}: applying {target} ({step.__name__})")
+            conn.execute("BEGIN")
+            try:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            version = target
+        print(f"{path}: at version {version}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(here, "instance", "*.db")))
+    for db_path in paths:
+        migrate(db_path)
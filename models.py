@@ -1,9 +1,35 @@
 # models.py
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import or_
+import recurrence
 
 db = SQLAlchemy()
 
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# ---------------- Day / time helpers ----------------
+def day_index(name):
+    """'Monday' -> 0 ... 'Sunday' -> 6 (case-insensitive). Raises ValueError."""
+    try:
+        return [d.lower() for d in DAYS].index(name.strip().lower())
+    except ValueError:
+        raise ValueError(f"invalid day {name!r}") from None
+
+def to_minutes(hhmm):
+    """'09:30' -> 570. Accepts H:MM too; raises ValueError for anything else."""
+    try:
+        hours, minutes = (int(part) for part in hhmm.strip().split(":"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"invalid time {hhmm!r}") from None
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"invalid time {hhmm!r}")
+    return hours * 60 + minutes
+
+def format_minutes(minutes):
+    """570 -> '09:30'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
 class Classroom(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     room_name = db.Column(db.String(50), unique=True, nullable=False)
@@ -16,13 +42,133 @@ class Classroom(db.Model):
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     classroom_id = db.Column(db.Integer, db.ForeignKey('classroom.id'), nullable=False)
-    teacher_name = db.Column(db.String(100), nullable=False)
-    day = db.Column(db.String(20), nullable=False)         # e.g., "Monday"
-    start_time = db.Column(db.String(10), nullable=False)  # "09:00"
-    end_time = db.Column(db.String(10), nullable=False)    # "10:00"
+    teacher_name = db.Column(db.String(100), nullable=False, index=True)
+    day = db.Column(db.Integer, nullable=False)            # 0 = Monday ... 6 = Sunday
+    start_min = db.Column(db.Integer, nullable=False)      # minutes after midnight, 540 = 09:00
+    end_min = db.Column(db.Integer, nullable=False)        # 600 = 10:00
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # A booking is a weekly rule: it repeats on `day` from valid_from to valid_to
+    # (NULL = open-ended), skipping except_dates. valid_from == valid_to is a one-off.
+    valid_from = db.Column(db.Date)
+    valid_to = db.Column(db.Date)
+    except_dates = db.Column(db.Text)                      # comma-separated ISO dates
 
     classroom = db.relationship('Classroom', backref='bookings')
 
+    __table_args__ = (
+        db.Index('ix_booking_room_day_start', 'classroom_id', 'day', 'start_min'),
+    )
+
+    @property
+    def day_name(self):
+        return DAYS[self.day]
+
+    @property
+    def start_time(self):
+        return format_minutes(self.start_min)
+
+    @property
+    def end_time(self):
+        return format_minutes(self.end_min)
+
+    @property
+    def exceptions(self):
+        return recurrence.parse_dates(self.except_dates)
+
+    @property
+    def rule(self):
+        return recurrence.Rule(self.valid_from, self.valid_to, self.exceptions)
+
+    @property
+    def repeats(self):
+        return recurrence.describe(self.rule)
+
+    @classmethod
+    def overlapping(cls, classroom_id, day, start_min, end_min):
+        """Query for bookings of a room on a day that overlap [start_min, end_min)."""
+        return cls.query.filter(
+            cls.classroom_id == classroom_id,
+            cls.day == day,
+            cls.start_min < end_min,
+            cls.end_min > start_min,
+        )
+
+    @classmethod
+    def first_clash(cls, classroom_id, day, start_min, end_min, rule, exclude_id=None):
+        """First booking that overlaps [start_min, end_min) on a date `rule` also falls on, or None.
+
+        SQL narrows by time and date range; exceptions are compared in Python.
+        """
+        query = cls.overlapping(classroom_id, day, start_min, end_min)
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        if rule.valid_from is not None:
+            query = query.filter(or_(cls.valid_to.is_(None), cls.valid_to >= rule.valid_from))
+        if rule.valid_to is not None:
+            query = query.filter(or_(cls.valid_from.is_(None), cls.valid_from <= rule.valid_to))
+        return next((b for b in query if recurrence.clashes(day, rule, b.rule)), None)
+
     def __repr__(self):
-        return f"<Booking {self.classroom_id} {self.day} {self.start_time}-{self.end_time}>"
+        return f"<Booking {self.classroom_id} {self.day_name} {self.start_time}-{self.end_time}>"
+
+class BookingLog(db.Model):
+    """Append-only feed of committed booking changes.
+
+    Every worker replays entries newer than the last seq it has seen, which
+    keeps the per-process caches in booking_events listeners in step.
+    """
+    __tablename__ = 'booking_log'
+    seq = db.Column(db.Integer, primary_key=True)
+    op = db.Column(db.String(10), nullable=False)          # insert / update / delete
+    booking_id = db.Column(db.Integer, nullable=False)
+    classroom_id = db.Column(db.Integer, nullable=False)
+    teacher_name = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Integer, nullable=False)
+    start_min = db.Column(db.Integer, nullable=False)
+    end_min = db.Column(db.Integer, nullable=False)
+    valid_from = db.Column(db.Date)
+    valid_to = db.Column(db.Date)
+    except_dates = db.Column(db.Text)
+    # previous values, for updates only
+    old_classroom_id = db.Column(db.Integer)
+    old_teacher_name = db.Column(db.String(100))
+    old_day = db.Column(db.Integer)
+    old_start_min = db.Column(db.Integer)
+    old_end_min = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # AUTOINCREMENT: seq values are never reused after old entries are pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class RoomUtilization(db.Model):
+    """Booked minutes per room, weekday and hour of the day, for /stats.
+
+    Counts the bookings that occur in the week held by UtilizationWeek.
+    Maintained by utilization.apply() in the same transaction as each booking
+    write; utilization.rebuild() recomputes it from scratch.
+    """
+    __tablename__ = 'room_utilization'
+    classroom_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour = db.Column(db.Integer, primary_key=True, autoincrement=False)    # 9 = 09:00-10:00
+    minutes = db.Column(db.Integer, nullable=False, default=0)   # summed over bookings; > 60 means overlaps
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UtilizationWeek(db.Model):
+    """One row: the Monday of the week room_utilization currently counts."""
+    __tablename__ = 'utilization_week'
+    id = db.Column(db.Integer, primary_key=True)
+    week = db.Column(db.Date, nullable=False)
+
+
+class CatalogVersion(db.Model):
+    """One row whose stamp changes whenever classrooms do.
+
+    Each process compares it with the stamp of its in-memory classroom
+    catalog and reloads only when they differ.
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    stamp = db.Column(db.String(32), nullable=False)
@@ -0,0 +1,76 @@
+# occupancy.py
+# Occupancy bitmaps for free-room searches.
+#
+# Each room-day is a Python int used as a bitmap with one bit per minute of
+# the day (bit m set = minute m is booked).  A window is turned into the same
+# kind of mask once, so "is this room free?" is a single AND per room.
+
+import threading
+
+
+def window_mask(start, end):
+    """Bitmap covering the half-open window [start, end) in minutes."""
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+class OccupancyGrid:
+    """Per-day room bitmaps, kept current through booking_events."""
+
+    def __init__(self):
+        self._masks = {}        # day -> {classroom_id: bitmap}
+        self._spans = {}        # (classroom_id, day) -> {booking_id: bitmap}
+        self._where = {}        # booking id -> (classroom_id, day)
+        self._lock = threading.Lock()
+
+    # -- booking_events listener API --
+
+    def rebuild(self, rows):
+        with self._lock:
+            self._masks, self._spans, self._where = {}, {}, {}
+            for row in rows:
+                self._add(row)
+
+    def apply(self, changes):
+        with self._lock:
+            for change in changes:
+                self._discard(change.row.id)
+                if change.op != "delete":
+                    self._add(change.row)
+
+    # -- queries --
+
+    def free_rooms(self, day, start, end, classroom_ids):
+        """Return the ids from classroom_ids with nothing booked in [start, end)."""
+        mask = window_mask(start, end)
+        with self._lock:
+            day_masks = self._masks.get(day, {})
+            return [cid for cid in classroom_ids if not day_masks.get(cid, 0) & mask]
+
+    # -- internals --
+
+    def _add(self, row):
+        bits = window_mask(row.start_min, row.end_min)
+        key = (row.classroom_id, row.day)
+        self._spans.setdefault(key, {})[row.id] = bits
+        self._where[row.id] = key
+        day_masks = self._masks.setdefault(row.day, {})
+        day_masks[row.classroom_id] = day_masks.get(row.classroom_id, 0) | bits
+
+    def _discard(self, booking_id):
+        key = self._where.pop(booking_id, None)
+        if key is None:
+            return
+        spans = self._spans[key]
+        spans.pop(booking_id, None)
+        classroom_id, day = key
+        # Recompute from the remaining bookings so overlapping rows stay marked.
+        combined = 0
+        for bits in spans.values():
+            combined |= bits
+        if spans:
+            self._masks[day][classroom_id] = combined
+        else:
+            del self._spans[key]
+            self._masks[day].pop(classroom_id, None)
@@ -0,0 +1,118 @@
+# recurrence.py
+# Bookings are weekly rules: a weekday and time, valid between two optional
+# dates, minus per-date exceptions. A one-off booking is a rule whose range
+# is a single day. Nothing is stored per date; occurrences are generated on
+# demand for the range being looked at, and clashes are decided on the rules.
+#
+# Functions take rule-like objects with valid_from / valid_to (date or None
+# for unbounded) and exceptions (a set of dates), plus the rule's weekday.
+
+from collections import namedtuple
+from datetime import date, timedelta
+import heapq
+
+WEEK = timedelta(days=7)
+
+# A rule's date range and skipped dates; also the probe for conflict checks.
+Rule = namedtuple("Rule", "valid_from valid_to exceptions", defaults=(None, None, frozenset()))
+ALWAYS = Rule()
+
+# One dated instance of a rule.
+Occurrence = namedtuple("Occurrence", "date day start_min end_min rule")
+
+
+def parse_dates(text):
+    """'2026-10-19,2026-10-26' (the except_dates column) -> frozenset of dates."""
+    if not text:
+        return frozenset()
+    return frozenset(date.fromisoformat(part) for part in text.split(",") if part)
+
+
+def format_dates(dates):
+    return ",".join(sorted(d.isoformat() for d in dates))
+
+
+def describe(rule):
+    """'Weekly', 'Once on 2026-10-21', 'Weekly 2026-10-19 to 2026-12-18, 2 dates skipped' ..."""
+    if rule.valid_from is not None and rule.valid_from == rule.valid_to:
+        return f"Once on {rule.valid_from.isoformat()}"
+    text = "Weekly"
+    if rule.valid_from and rule.valid_to:
+        text += f" {rule.valid_from.isoformat()} to {rule.valid_to.isoformat()}"
+    elif rule.valid_from:
+        text += f" from {rule.valid_from.isoformat()}"
+    elif rule.valid_to:
+        text += f" until {rule.valid_to.isoformat()}"
+    if rule.exceptions:
+        text += f", {len(rule.exceptions)} date{'s' if len(rule.exceptions) > 1 else ''} skipped"
+    return text
+
+
+def moved(rule, old_day, new_day):
+    """The rule after its booking moves to another weekday.
+
+    Exceptions (and a one-off's date) move with it to the same week.
+    """
+    shift = timedelta(days=new_day - old_day)
+    if not shift:
+        return rule
+    once = rule.valid_from is not None and rule.valid_from == rule.valid_to
+    return Rule(rule.valid_from + shift if once else rule.valid_from,
+                rule.valid_to + shift if once else rule.valid_to,
+                frozenset(d + shift for d in rule.exceptions))
+
+
+def week_start(d):
+    """Monday of the week containing d."""
+    return d - timedelta(days=d.weekday())
+
+
+def first_on_or_after(day, d):
+    """First date on weekday `day` (0 = Monday) that is not before d."""
+    return d + timedelta(days=(day - d.weekday()) % 7)
+
+
+def in_range(rule, d):
+    return (rule.valid_from is None or rule.valid_from <= d) and \
+        (rule.valid_to is None or d <= rule.valid_to)
+
+
+def occurs_on(rule, day, d):
+    return d.weekday() == day and in_range(rule, d) and d not in rule.exceptions
+
+
+def occurrences(rule, day, start, end):
+    """Yield the rule's Occurrences between start and end (dates, inclusive)."""
+    lo = max(start, rule.valid_from) if rule.valid_from else start
+    hi = min(end, rule.valid_to) if rule.valid_to else end
+    d = first_on_or_after(day, lo)
+    while d <= hi:
+        if d not in rule.exceptions:
+            yield Occurrence(d, day, rule.start_min, rule.end_min, rule)
+        d += WEEK
+
+
+def expand(rules, start, end):
+    """Merge the occurrences of (day, rule) pairs into one stream ordered by date and time."""
+    return heapq.merge(*(occurrences(rule, day, start, end) for day, rule in rules),
+                       key=lambda o: (o.date, o.start_min))
+
+
+def clashes(day, a, b):
+    """True if rules a and b (same weekday, overlapping times) share a date.
+
+    Their shared dates are the weekday's dates in the intersection of both
+    ranges; they clash unless every one of those is an exception of either
+    rule. An unbounded intersection always clashes, since exceptions are finite.
+    """
+    lo = max(a.valid_from, b.valid_from) if a.valid_from and b.valid_from else a.valid_from or b.valid_from
+    hi = min(a.valid_to, b.valid_to) if a.valid_to and b.valid_to else a.valid_to or b.valid_to
+    if lo is None or hi is None:
+        return True
+    first = first_on_or_after(day, lo)
+    if first > hi:
+        return False
+    shared = (hi - first).days // 7 + 1
+    skipped = {d for d in a.exceptions | b.exceptions
+               if first <= d <= hi and d.weekday() == day}
+    return shared > len(skipped)
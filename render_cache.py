@@ -0,0 +1,79 @@
+# render_cache.py
+# LRU cache of rendered timetable pages, invalidated per room by booking writes.
+
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+import hashlib
+import threading
+
+# etag is a hash of the body, so it is stable across workers and restarts.
+CachedPage = namedtuple("CachedPage", "body etag last_modified")
+
+
+class RenderCache:
+    """Rendered pages keyed by (room id, room version, extra key).
+
+    Each room has a version counter bumped whenever one of its bookings is
+    inserted, updated or deleted (via booking_events), so stale entries are
+    simply never looked up again and age out of the LRU.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._pages = OrderedDict()
+        self._versions = {}         # classroom_id -> (version, last_modified)
+        self._started = _now()
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    # -- booking_events listener API --
+
+    def rebuild(self, rows):
+        with self._lock:
+            self._epoch += 1
+            self._versions.clear()
+            self._pages.clear()
+            self._started = _now()
+
+    def apply(self, changes):
+        with self._lock:
+            for change in changes:
+                self._bump(change.row.classroom_id)
+                if change.old is not None:
+                    self._bump(change.old.classroom_id)
+
+    # -- cache API --
+
+    def version(self, classroom_id):
+        """Return (version key, last modified) for a room."""
+        with self._lock:
+            version, modified = self._versions.get(classroom_id, (0, self._started))
+            return (self._epoch, version), modified
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, body, last_modified):
+        page = CachedPage(body, hashlib.sha1(body.encode("utf-8")).hexdigest(), last_modified)
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+        return page
+
+    def __len__(self):
+        return len(self._pages)
+
+    def _bump(self, classroom_id):
+        version, _ = self._versions.get(classroom_id, (0, None))
+        self._versions[classroom_id] = (version + 1, _now())
+
+
+def _now():
+    # HTTP dates have one-second resolution
+    return datetime.now(timezone.utc).replace(microsecond=0)
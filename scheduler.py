@@ -0,0 +1,48 @@
+# scheduler.py
+# Minimal in-process periodic task runner for housekeeping jobs.
+
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Run func every `interval` seconds on a daemon thread.
+
+    start() is idempotent and remembers the pid it started in, so calling it
+    from a request hook after a gunicorn fork starts one thread per worker.
+    An interval of 0 (or less) disables the task.
+    """
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.func()
+            except Exception:
+                log.exception("periodic task %s failed", self.name)
+            if self._stop.wait(self.interval):
+                return
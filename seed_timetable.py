@@ -1,30 +1,43 @@
 # seed_timetable.py
-# Run: python seed_timetable.py
+# Run: python seed_timetable.py [--floors 4] [--it-divisions 6] [--cs-divisions 12] [--seed 2025] ...
+#      (python seed_timetable.py --help lists every option)
 # WARNING: This script will DROP existing tables and create a fresh database.
+#
+# The whole timetable is planned in memory and written with two bulk inserts,
+# so large staging / load-test databases take seconds rather than hours.
 
-from app import app          # uses your existing Flask app & config
-from models import db, Classroom, Booking
+from app import create_app   # same config as the app (DATABASE_URL etc.)
+from models import db, Classroom, Booking, day_index, to_minutes, DAYS
+from sqlalchemy import insert
+import catalog
+import utilization
+from collections import deque
 from datetime import time
+import argparse
 import itertools
 import random
 
-def create_classrooms():
-    """Create all Building-11 rooms (lectures + labs)."""
+def create_classrooms(floors=4, lectures_per_floor=20, labs_per_floor=6, ground_labs=2):
+    """Create all Building-11 rooms (lectures + labs).
+
+    Defaults reproduce the real building: 1016A/B on the ground floor and
+    floors 11xx-14xx with lectures xx01-xx20 and labs xx21-xx26.
+    """
     rooms = []
 
     # Ground floor labs
-    rooms += [("1016A", "Lab"), ("1016B", "Lab")]
+    rooms += [(f"1016{chr(ord('A') + i)}", "Lab") for i in range(ground_labs)]
 
-    # Floors 1..4
-    for floor_prefix in ("11", "12", "13", "14"):
+    # Floors 1..N; room numbers widen past 99 rooms per floor
+    width = max(2, len(str(lectures_per_floor + labs_per_floor)))
+    for floor in range(1, floors + 1):
+        floor_prefix = str(10 + floor)
         # lectures xx01 - xx20
-        for i in range(1, 21):
-            room_name = f"{floor_prefix}{i:02d}"
-            rooms.append((room_name, "Lecture"))
+        for i in range(1, lectures_per_floor + 1):
+            rooms.append((f"{floor_prefix}{i:0{width}d}", "Lecture"))
         # labs xx21 - xx26
-        for i in range(21, 27):
-            room_name = f"{floor_prefix}{i}"
-            rooms.append((room_name, "Lab"))
+        for i in range(lectures_per_floor + 1, lectures_per_floor + labs_per_floor + 1):
+            rooms.append((f"{floor_prefix}{i:0{width}d}", "Lab"))
     return rooms
 
 def time_str(t):
@@ -78,9 +91,18 @@ def slots_to_lab_pairs(slots):
         pairs.append((slots[0][0], slots[1][1]))
     return pairs
 
-def division_lists():
-    it_divs = [f"IT-{chr(ord('A')+i)}" for i in range(6)]        # IT-A .. IT-F
-    cs_divs = [f"CS-{chr(ord('A')+i)}" for i in range(12)]       # CS-A .. CS-L
+def division_name(dept, i):
+    """0 -> 'IT-A', 25 -> 'IT-Z', 26 -> 'IT-AA' ..."""
+    letters = ""
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return f"{dept}-{letters}"
+
+def division_lists(it_count=6, cs_count=12):
+    it_divs = [division_name("IT", i) for i in range(it_count)]    # IT-A .. IT-F
+    cs_divs = [division_name("CS", i) for i in range(cs_count)]    # CS-A .. CS-L
     return it_divs, cs_divs
 
 def faculty_pool():
@@ -98,147 +120,145 @@ def subjects_pool():
         "Python Lab", "Java Lab", "Project Work"
     ]
 
-def day_lists():
-    it_days = ["Monday","Tuesday","Wednesday","Thursday","Friday"]
-    cs_days = ["Monday","Tuesday","Wednesday","Thursday"]
+def day_lists(days=5):
+    it_days = DAYS[:days]                   # Monday .. Friday
+    cs_days = DAYS[:max(1, days - 1)]       # Monday .. Thursday
     return it_days, cs_days
 
-def is_conflict(room_id, day, start, end):
-    """Return True if room already booked for the day & time overlap."""
-    # query bookings for this room and day and check overlap
-    existing = Booking.query.filter_by(classroom_id=room_id, day=day).all()
-    for b in existing:
-        if not (end <= b.start_time or start >= b.end_time):
-            return True
-    return False
+class RoomPlanner:
+    """Hands out rooms for (day, start, end) windows without touching the DB.
+
+    Every room keeps a per-day bitmap of the minutes already taken. For each
+    distinct (day, window) there is a queue of candidate rooms in round-robin
+    order; a room is dropped from a queue the first time it is found busy for
+    that window (bookings are never removed while planning), so each
+    allocation is amortized O(1).
+    """
+
+    def __init__(self, room_ids, rng):
+        self.room_ids = list(room_ids)
+        self.rng = rng
+        self.busy = {}          # (room_id, day) -> minute bitmap
+        self.queues = {}        # (day, start, end) -> deque of room ids
+
+    def allocate(self, day, start, end):
+        """Return a free room id for [start, end) minutes on day, or None."""
+        key = (day, start, end)
+        queue = self.queues.get(key)
+        if queue is None:
+            # start each window's rotation somewhere new so load spreads over rooms
+            offset = self.rng.randrange(len(self.room_ids)) if self.room_ids else 0
+            queue = self.queues[key] = deque(self.room_ids[offset:] + self.room_ids[:offset])
+        mask = ((1 << (end - start)) - 1) << start
+        while queue:
+            room_id = queue.popleft()
+            taken = self.busy.get((room_id, day), 0)
+            if not taken & mask:
+                self.busy[(room_id, day)] = taken | mask
+                return room_id
+        return None
+
+def plan_timetable(lecture_room_ids, lab_room_ids, it_divs, cs_divs, it_days, cs_days, rng):
+    """Return Booking rows (dicts) for every division, planned entirely in memory."""
+    slots = [(to_minutes(s), to_minutes(e)) for s, e in generate_slots()]
+    lab_pairs = [(to_minutes(s), to_minutes(e)) for s, e in slots_to_lab_pairs(generate_slots())]
+
+    lectures = RoomPlanner(lecture_room_ids, rng)
+    labs = RoomPlanner(lab_room_ids, rng)
+    faculty_cycle = itertools.cycle(faculty_pool())
+    rows = []
+
+    def assign_for_division(div_name, days):
+        """
+        For each day assign:
+          - 4 to 6 lecture 1-hour slots (mixed morning + afternoon)
+          - 1 lab 2-hour block (prefers afternoon)
+        """
+        for day in days:
+            day_num = day_index(day)
+            # decide number of lecture hours for this division on this day (4..6)
+            num_lectures = rng.randint(4, 6)
 
-def seed_database():
+            # ensure at least 2 morning (or as many as possible) if num_lectures >=2
+            morning_indices = [i for i in range(0, 4) if i < len(slots)]
+            chosen_indices = set(rng.sample(morning_indices, k=min(len(morning_indices), 2, num_lectures)))
+
+            # remaining to pick from both pools
+            remaining = num_lectures - len(chosen_indices)
+            combined_indices = [i for i in range(len(slots)) if i not in chosen_indices]
+            if remaining > 0 and combined_indices:
+                chosen_indices.update(rng.sample(combined_indices, k=min(remaining, len(combined_indices))))
+
+            for idx in sorted(chosen_indices):
+                start, end = slots[idx]
+                room_id = lectures.allocate(day_num, start, end)
+                if room_id is None:
+                    continue  # couldn't find a room for this slot, skip it
+                rows.append(dict(classroom_id=room_id, teacher_name=f"{div_name} - {next(faculty_cycle)}",
+                                 day=day_num, start_min=start, end_min=end))
+
+            # assign a lab (2-hour pair) - prefer first lab_pairs item
+            for lstart, lend in lab_pairs:
+                room_id = labs.allocate(day_num, lstart, lend)
+                if room_id is not None:
+                    rows.append(dict(classroom_id=room_id, teacher_name=f"{div_name} - {next(faculty_cycle)}",
+                                     day=day_num, start_min=lstart, end_min=lend))
+                    break
+            # if no lab assigned, we skip (rare)
+
+    # Seed IT divisions (Mon-Fri)
+    for div in it_divs:
+        assign_for_division(div, it_days)
+
+    # Seed CS divisions (Mon-Thu)
+    for div in cs_divs:
+        assign_for_division(div, cs_days)
+
+    return rows
+
+def seed_database(floors=4, lectures_per_floor=20, labs_per_floor=6, ground_labs=2,
+                  it_divisions=6, cs_divisions=12, days=5, seed=2025, config=None):
+    """Rebuild the database; config overrides the app settings (e.g. SQLALCHEMY_DATABASE_URI)."""
+    rng = random.Random(seed)
+    app = create_app(config)
     with app.app_context():
         # Reset DB (drop & recreate)
         db.drop_all()
         db.create_all()
 
-        # Create classrooms
-        rooms = create_classrooms()
-        classroom_objs = []
-        for rname, rtype in rooms:
-            c = Classroom(room_name=rname, room_type=rtype)
-            db.session.add(c)
-            classroom_objs.append(c)
-        db.session.commit()
-        print(f"Created {len(classroom_objs)} classrooms.")
-
-        # prepare pools and structures
-        lecture_rooms = [c for c in Classroom.query.filter_by(room_type="Lecture").all()]
-        lab_rooms = [c for c in Classroom.query.filter_by(room_type="Lab").all()]
-
-        slots = generate_slots()
-        lab_pairs = slots_to_lab_pairs(slots)
-        it_divs, cs_divs = division_lists()
-        it_days, cs_days = day_lists()
-        faculties = faculty_pool()
-        subjects = subjects_pool()
-
-        # cycles for rooms and faculties to distribute evenly
-        lecture_cycle = itertools.cycle(lecture_rooms)
-        lab_cycle = itertools.cycle(lab_rooms)
-        faculty_cycle = itertools.cycle(faculties)
-        subject_cycle = itertools.cycle(subjects)
-
-        # Helper: assign for department divisions
-        def assign_for_division(div_name, days):
-            """
-            For each day assign:
-              - 4 to 6 lecture 1-hour slots (mixed morning + afternoon)
-              - 1 lab 2-hour block (prefers afternoon)
-            """
-            for day in days:
-                # decide number of lecture hours for this division on this day (4..6)
-                num_lectures = random.randint(4, 6)
-
-                # prefer to allocate at least 2 in morning and at least 1 in afternoon if possible
-                morning_indices = [i for i in range(0, 4) if i < len(slots)]
-                afternoon_indices = [i for i in range(4, len(slots)) if i < len(slots)]
-
-                chosen_indices = set()
-
-                # ensure at least 2 morning (or as many as possible) if num_lectures >=2
-                want_morning = min(2, num_lectures)
-                morning_choices = random.sample(morning_indices, k=min(len(morning_indices), want_morning)) if morning_indices else []
-                chosen_indices.update(morning_choices)
-
-                # remaining to pick from both pools
-                remaining = num_lectures - len(chosen_indices)
-                combined_indices = [i for i in range(len(slots)) if i not in chosen_indices]
-                if remaining > 0 and combined_indices:
-                    # try to pick a balanced mix; sample without replacement
-                    pick = min(remaining, len(combined_indices))
-                    extra = random.sample(combined_indices, k=pick)
-                    chosen_indices.update(extra)
-
-                # Now assign lectures for chosen indices
-                for idx in sorted(chosen_indices):
-                    start, end = slots[idx]
-                    # pick next lecture room without conflict
-                    attempts = 0
-                    room = None
-                    while attempts <= len(lecture_rooms)*2:
-                        candidate = next(lecture_cycle)
-                        if not is_conflict(candidate.id, day, start, end):
-                            room = candidate
-                            break
-                        attempts += 1
-                    if room is None:
-                        # couldn't find a room for this slot, skip it
-                        continue
-                    teacher = f"{div_name} - {next(faculty_cycle)}"
-                    # subject is chosen but not stored in Booking model (kept for eventual extension)
-                    subj = next(subject_cycle)
-                    booking = Booking(
-                        classroom_id=room.id,
-                        teacher_name=teacher,
-                        day=day,
-                        start_time=start,
-                        end_time=end
-                    )
-                    db.session.add(booking)
-
-                # assign a lab (2-hour pair) - prefer first lab_pairs item
-                assigned_lab = False
-                for (lstart, lend) in lab_pairs:
-                    attempts = 0
-                    labroom = None
-                    while attempts <= len(lab_rooms)*2:
-                        candidate_lab = next(lab_cycle)
-                        if not is_conflict(candidate_lab.id, day, lstart, lend):
-                            labroom = candidate_lab
-                            break
-                        attempts += 1
-                    if labroom:
-                        teacher = f"{div_name} - {next(faculty_cycle)}"
-                        booking = Booking(
-                            classroom_id=labroom.id,
-                            teacher_name=teacher,
-                            day=day,
-                            start_time=lstart,
-                            end_time=lend
-                        )
-                        db.session.add(booking)
-                        assigned_lab = True
-                        break
-                # if no lab assigned, we skip (rare)
-
-        # Seed IT divisions (Mon-Fri)
-        for div in it_divs:
-            assign_for_division(div, it_days)
-
-        # Seed CS divisions (Mon-Thu)
-        for div in cs_divs:
-            assign_for_division(div, cs_days)
+        # Create classrooms in one statement, then read back their ids
+        rooms = create_classrooms(floors, lectures_per_floor, labs_per_floor, ground_labs)
+        db.session.execute(insert(Classroom), [dict(room_name=n, room_type=t) for n, t in rooms])
+        catalog.bump(db.session)  # running workers reload their room list
+        room_ids = dict(db.session.query(Classroom.room_name, Classroom.id))
+        print(f"Created {len(rooms)} classrooms.")
 
+        lecture_room_ids = [room_ids[n] for n, t in rooms if t == "Lecture"]
+        lab_room_ids = [room_ids[n] for n, t in rooms if t == "Lab"]
+        it_divs, cs_divs = division_lists(it_divisions, cs_divisions)
+        it_days, cs_days = day_lists(days)
+
+        rows = plan_timetable(lecture_room_ids, lab_room_ids, it_divs, cs_divs, it_days, cs_days, rng)
+        db.session.execute(insert(Booking), rows)
+        utilization.rebuild(db.session)  # bulk insert bypasses booking_events
         db.session.commit()
-        print("Seeding complete. Bookings added.")
+        print(f"Seeding complete. {len(rows)} bookings added.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the database with a generated timetable.")
+    parser.add_argument("--floors", type=int, default=4, help="floors above ground (default 4)")
+    parser.add_argument("--lectures-per-floor", type=int, default=20)
+    parser.add_argument("--labs-per-floor", type=int, default=6)
+    parser.add_argument("--ground-labs", type=int, default=2)
+    parser.add_argument("--it-divisions", type=int, default=6)
+    parser.add_argument("--cs-divisions", type=int, default=12)
+    parser.add_argument("--days", type=int, default=5, choices=range(1, 8),
+                        help="teaching days per week for IT; CS gets one fewer (default 5)")
+    parser.add_argument("--seed", type=int, default=2025, help="random seed (default 2025)")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    seed_database()
+    args = parse_args()
+    seed_database(args.floors, args.lectures_per_floor, args.labs_per_floor, args.ground_labs,
+                  args.it_divisions, args.cs_divisions, args.days, args.seed)
     print("Database rebuilt and seeded successfully.")
@@ -0,0 +1,51 @@
+# slot_search.py
+# Earliest free windows across rooms, found by walking each room's sorted
+# bookings once instead of probing fixed windows one at a time.
+
+from collections import namedtuple
+import heapq
+
+# One candidate: the whole free gap [start_min, end_min) in a room on a day,
+# on one date or (date None) every week.
+Slot = namedtuple("Slot", "day start_min end_min classroom_id room_name room_type capacity date",
+                  defaults=(None,))
+
+
+def free_gaps(intervals, open_min, close_min):
+    """Yield (start, end) gaps inside [open_min, close_min) not covered by intervals.
+
+    intervals must be sorted by start; overlapping or touching ones are merged
+    on the fly, so this is a single pass.
+    """
+    cursor = open_min
+    for iv in intervals:
+        if iv.start_min >= close_min:
+            break
+        if iv.start_min > cursor:
+            yield cursor, iv.start_min
+        cursor = max(cursor, iv.end_min)
+    if cursor < close_min:
+        yield cursor, close_min
+
+
+def find_slots(rooms, days, duration, busy, open_min, close_min, limit=10):
+    """The `limit` earliest gaps of at least `duration` minutes.
+
+    rooms are Classroom-like objects (id, room_name, room_type, capacity);
+    days are (weekday, date or None) pairs in order, and busy(classroom_id,
+    weekday, date) returns the sorted intervals that take that room then.
+    Results are ranked by day, start, then the smallest room that fits, so a
+    30-seat group isn't sent to a 120-seat hall when both are free.
+    """
+    found = []
+    for day, on in days:
+        # Everything on an earlier day outranks a later one, so stop once filled.
+        if len(found) >= limit:
+            break
+        day_slots = (Slot(day, start, end, room.id, room.room_name, room.room_type, room.capacity or 0, on)
+                     for room in rooms
+                     for start, end in free_gaps(busy(room.id, day, on), open_min, close_min)
+                     if end - start >= duration)
+        found += heapq.nsmallest(limit - len(found), day_slots,
+                                 key=lambda s: (s.start_min, s.capacity, s.room_name))
+    return found
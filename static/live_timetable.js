@@ -0,0 +1,67 @@
+// Keep the displayed room's timetable current from the /events stream.
+(function () {
+  const room = document.querySelector('.classroom[data-events-url]');
+  if (!room || !window.EventSource) return;
+  const roomId = Number(room.dataset.roomId);
+
+  function freeRow() {
+    const row = document.createElement('tr');
+    row.className = 'free';
+    row.innerHTML = '<td colspan="4">✅ No bookings — classroom is free all day.</td>';
+    return row;
+  }
+
+  function removeBooking(id) {
+    const row = room.querySelector('tr[data-booking-id="' + id + '"]');
+    if (!row) return;
+    const tbody = row.parentNode;
+    row.remove();
+    if (!tbody.querySelector('tr.booked')) tbody.appendChild(freeRow());
+  }
+
+  // Bookings are weekly rules; only show them on the dates they fall on (ISO dates compare as strings)
+  function occursOn(b, date) {
+    return (!b.valid_from || b.valid_from <= date) && (!b.valid_to || date <= b.valid_to) &&
+      b.except_dates.indexOf(date) < 0;
+  }
+
+  function addBooking(b) {
+    if (b.classroom_id !== roomId) return;
+    const block = room.querySelector('.day-block[data-day="' + b.day + '"]');
+    if (!block) return;  // Sunday isn't shown
+    if (!occursOn(b, block.dataset.date)) return;
+    const tbody = block.querySelector('tbody');
+    const free = tbody.querySelector('tr.free');
+    if (free) free.remove();
+
+    const row = document.createElement('tr');
+    row.className = 'booked';
+    row.dataset.bookingId = b.id;
+    [b.start, b.end, b.teacher, 'Booked'].forEach(function (text) {
+      row.insertCell().textContent = text;
+    });
+    // Rows are kept in start-time order; HH:MM strings sort correctly
+    const next = Array.from(tbody.querySelectorAll('tr.booked')).find(function (r) {
+      return r.cells[0].textContent > b.start;
+    });
+    tbody.insertBefore(row, next || null);
+  }
+
+  const source = new EventSource(room.dataset.eventsUrl);
+  source.addEventListener('booking-created', function (e) {
+    addBooking(JSON.parse(e.data));
+  });
+  source.addEventListener('booking-updated', function (e) {
+    const b = JSON.parse(e.data);
+    removeBooking(b.id);
+    addBooking(b);
+  });
+  source.addEventListener('booking-cancelled', function (e) {
+    removeBooking(JSON.parse(e.data).id);
+  });
+  // The server lost track of changes (or this tab fell behind): start over
+  source.addEventListener('reload', function () {
+    source.close();
+    window.location.reload();
+  });
+})();
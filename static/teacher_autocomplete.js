@@ -0,0 +1,26 @@
+// Fill the teacher-names datalist from /api/teachers as the user types.
+(function () {
+  const input = document.querySelector('input[list="teacher-names"]');
+  const list = document.getElementById('teacher-names');
+  if (!input || !list) return;
+
+  let pending = null;
+  input.addEventListener('input', function () {
+    const prefix = input.value.trim();
+    if (pending) pending.abort();
+    if (!prefix) { list.innerHTML = ''; return; }
+
+    pending = new AbortController();
+    fetch('/api/teachers?prefix=' + encodeURIComponent(prefix), { signal: pending.signal })
+      .then(function (r) { return r.json(); })
+      .then(function (data) {
+        list.innerHTML = '';
+        data.teachers.forEach(function (name) {
+          const option = document.createElement('option');
+          option.value = name;
+          list.appendChild(option);
+        });
+      })
+      .catch(function () { /* aborted or offline: keep the old suggestions */ });
+  });
+})();
@@ -0,0 +1,94 @@
+# teacher_directory.py
+# In-memory teacher name directory for prefix autocomplete.
+
+from bisect import bisect_left, insort
+import threading
+
+
+def search_keys(name):
+    """Lower-cased keys a name can be found under.
+
+    "IT-A - Prof. Sharma" is found by typing "it-a", "prof" or "sharma":
+    the full name plus every suffix that starts at a word.
+    """
+    words = name.lower().split()
+    keys = {" ".join(words)}
+    for i in range(1, len(words)):
+        if words[i][:1].isalnum():
+            keys.add(" ".join(words[i:]))
+    return keys
+
+
+class TeacherDirectory:
+    """Sorted (key, name) array searched with bisect, kept current through booking_events.
+
+    Names are reference-counted by booking so a teacher disappears once
+    their last booking is cancelled.
+    """
+
+    def __init__(self):
+        self._entries = []      # sorted (key, name)
+        self._counts = {}       # name -> number of bookings
+        self._names = {}        # booking id -> teacher name
+        self._lock = threading.Lock()
+
+    # -- booking_events listener API --
+
+    def rebuild(self, rows):
+        names = {row.id: row.teacher_name for row in rows}
+        counts = {}
+        for name in names.values():
+            counts[name] = counts.get(name, 0) + 1
+        entries = sorted((key, name) for name in counts for key in search_keys(name))
+        with self._lock:
+            self._entries, self._counts, self._names = entries, counts, names
+
+    def apply(self, changes):
+        with self._lock:
+            for change in changes:
+                self._release(change.row.id)
+                if change.op != "delete":
+                    self._hold(change.row.id, change.row.teacher_name)
+
+    # -- queries --
+
+    def complete(self, prefix, limit=10):
+        """Up to `limit` distinct teacher names with a word starting with prefix."""
+        key = " ".join(prefix.lower().split())
+        if not key:
+            return []
+        found = []
+        with self._lock:
+            i = bisect_left(self._entries, (key,))
+            while i < len(self._entries) and len(found) < limit:
+                entry_key, name = self._entries[i]
+                if not entry_key.startswith(key):
+                    break
+                if name not in found:
+                    found.append(name)
+                i += 1
+        return sorted(found)
+
+    def __contains__(self, name):
+        return name in self._counts
+
+    # -- internals --
+
+    def _hold(self, booking_id, name):
+        self._names[booking_id] = name
+        self._counts[name] = self._counts.get(name, 0) + 1
+        if self._counts[name] == 1:
+            for key in search_keys(name):
+                insort(self._entries, (key, name))
+
+    def _release(self, booking_id):
+        name = self._names.pop(booking_id, None)
+        if name is None:
+            return
+        self._counts[name] -= 1
+        if self._counts[name] == 0:
+            del self._counts[name]
+            for key in search_keys(name):
+                i = bisect_left(self._entries, (key, name))
+                if i < len(self._entries) and self._entries[i] == (key, name):
+                    del self._entries[i]
@@ -0,0 +1,107 @@
+# test_recurrence.py
+# Run: python -m pytest -q
+# The pure functions behind date-aware conflict checks: recurrence rules and
+# the batch planners built on them.
+
+from collections import namedtuple
+from datetime import date, timedelta
+
+from batch import Conflict, PlannedBooking, plan, sweep
+from recurrence import Rule, clashes, moved
+
+MON = 0
+SUN = 6
+WEEK = timedelta(days=7)
+MONDAY = date(2026, 10, 19)   # a Monday; MONDAY + n * WEEK are the next ones
+
+# Stored booking as batch sees it (the BookingRow fields, with except_dates as stored)
+Row = namedtuple("Row", "id classroom_id teacher_name day start_min end_min valid_from valid_to except_dates",
+                 defaults=(None, None, None))
+
+
+def once(d):
+    return Rule(d, d)
+
+
+# ---------------- clashes ----------------
+def test_clashes_when_ranges_share_a_date():
+    assert clashes(MON, Rule(MONDAY, MONDAY + 2 * WEEK), Rule(MONDAY + 2 * WEEK, None))
+
+
+def test_no_clash_when_exceptions_cover_every_shared_date():
+    weekly = Rule(MONDAY, MONDAY + 3 * WEEK)
+    skipping = Rule(MONDAY + 2 * WEEK, None, frozenset({MONDAY + 2 * WEEK, MONDAY + 3 * WEEK}))
+    assert not clashes(MON, weekly, skipping)
+    assert not clashes(MON, once(MONDAY + WEEK), Rule(None, None, frozenset({MONDAY + WEEK})))
+
+
+def test_clash_when_exceptions_leave_a_shared_date():
+    weekly = Rule(MONDAY, MONDAY + 3 * WEEK, frozenset({MONDAY, MONDAY + WEEK}))
+    assert clashes(MON, weekly, Rule(MONDAY, MONDAY + 2 * WEEK))
+
+
+def test_no_clash_when_ranges_do_not_overlap():
+    assert not clashes(MON, Rule(MONDAY, MONDAY + WEEK), Rule(MONDAY + 2 * WEEK, None))
+    assert not clashes(MON, once(MONDAY), once(MONDAY + WEEK))
+    # The ranges overlap Tuesday-Sunday, but no Monday falls in between
+    assert not clashes(MON, Rule(None, MONDAY + timedelta(days=6)), Rule(MONDAY + timedelta(days=1), None))
+
+
+def test_open_ends():
+    assert clashes(MON, Rule(), once(MONDAY))
+    assert clashes(MON, Rule(None, MONDAY), Rule(None, MONDAY + WEEK))
+    assert not clashes(MON, Rule(None, MONDAY), Rule(MONDAY + timedelta(days=1), None))
+    # An unbounded intersection has more dates than any set of exceptions
+    assert clashes(MON, Rule(MONDAY, None), Rule(MONDAY, None, frozenset({MONDAY, MONDAY + WEEK})))
+
+
+# ---------------- moved ----------------
+def test_moved_one_off_stays_in_its_week():
+    sunday = MONDAY + timedelta(days=6)
+    assert moved(once(sunday), SUN, MON) == once(MONDAY)
+    assert moved(once(MONDAY), MON, SUN) == once(sunday)
+
+
+def test_moved_weekly_rule_keeps_its_range_and_shifts_exceptions():
+    rule = Rule(MONDAY, MONDAY + 4 * WEEK, frozenset({MONDAY + WEEK}))
+    assert moved(rule, MON, 2) == Rule(MONDAY, MONDAY + 4 * WEEK, frozenset({MONDAY + WEEK + timedelta(days=2)}))
+    assert moved(rule, MON, MON) is rule
+
+
+# ---------------- sweep ----------------
+def test_sweep_with_stored_rules_overlapping_in_time():
+    # Two one-offs in the same slot on different weeks: both stored, no clash between them
+    existing = [Row(1, 7, "A", MON, 540, 600, MONDAY, MONDAY),
+                Row(2, 7, "B", MON, 540, 600, MONDAY + WEEK, MONDAY + WEEK)]
+    planned = [
+        PlannedBooking(1, None, 7, "C", MON, 570, 630, MONDAY + WEEK, MONDAY + WEEK),
+        PlannedBooking(2, None, 7, "D", MON, 540, 600, MONDAY + 2 * WEEK, MONDAY + 2 * WEEK),
+        PlannedBooking(3, None, 7, "E", MON, 600, 660, MONDAY + 3 * WEEK, None),
+        PlannedBooking(4, None, 7, "F", MON, 555, 575, MONDAY + 2 * WEEK, None),
+    ]
+    assert sweep(existing, planned) == {
+        1: Conflict(2, None, "B", 540, 600),
+        4: Conflict(None, 2, "D", 540, 600),
+    }
+
+
+def test_sweep_skips_stored_dates_that_are_exceptions():
+    existing = [Row(1, 7, "A", MON, 540, 600, MONDAY, None, MONDAY.isoformat())]
+    planned = [PlannedBooking(1, None, 7, "B", MON, 540, 600, MONDAY, MONDAY)]
+    assert sweep(existing, planned) == {}
+
+
+# ---------------- plan ----------------
+def test_plan_releasing_a_move_frees_its_old_slot():
+    existing = [Row(1, 7, "A", MON, 540, 600)]
+    planned = [PlannedBooking(0, 1, 7, "A", MON, 600, 660),
+               PlannedBooking(1, None, 7, "B", MON, 540, 600)]
+    assert plan(existing, planned, released_ids={1}) == {}
+    assert plan(existing, planned) == {1: Conflict(1, None, "A", 540, 600)}
+
+
+def test_plan_earlier_item_wins_on_a_shared_date():
+    planned = [PlannedBooking(0, None, 7, "A", MON, 540, 600, MONDAY, MONDAY),
+               PlannedBooking(1, None, 7, "B", MON, 570, 630, MONDAY + WEEK, MONDAY + WEEK),
+               PlannedBooking(2, None, 7, "C", MON, 540, 570)]
+    assert plan([], planned) == {2: Conflict(None, 0, "A", 540, 600)}
@@ -0,0 +1,106 @@
+# test_utilization.py
+# Run: python -m pytest -q
+# The room_utilization aggregate behind /stats, kept current by booking
+# writes and the purge, against a throwaway SQLite database.
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import create_app, init_db, remove_past_bookings, run_write
+from models import db, Booking, Classroom, RoomUtilization
+import utilization
+
+WEEK = timedelta(days=7)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+                      "PURGE_INTERVAL_SECONDS": 0})
+    with app.app_context():
+        init_db()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def book(day, start_min, end_min, valid_from=None, valid_to=None, except_dates=None):
+    room = Classroom.query.first()
+    run_write(lambda: db.session.add(Booking(
+        classroom_id=room.id, teacher_name="T", day=day, start_min=start_min, end_min=end_min,
+        valid_from=valid_from, valid_to=valid_to, except_dates=except_dates)))
+    return room
+
+
+def aggregate():
+    """The stored table without rows that changes brought back to zero."""
+    return sorted(tuple(row) for row in db.session.execute(
+        select(RoomUtilization.classroom_id, RoomUtilization.day, RoomUtilization.hour,
+               RoomUtilization.minutes, RoomUtilization.bookings)
+        .where(RoomUtilization.bookings != 0)))
+
+
+def booked_minutes(app, room):
+    stats = app.test_client().get("/api/stats").get_json()
+    return next(r["booked_minutes"] for r in stats["rooms"] if r["room"] == room.room_name)
+
+
+def test_only_dates_in_the_counted_week_are_counted(app):
+    week = utilization.current_week()
+    room = book(0, 540, 600, week, week)                        # one-off this week
+    book(0, 540, 600, week + WEEK, week + WEEK)                 # same slot next week
+    book(1, 540, 600, week + WEEK, None)                        # weekly, not started yet
+    book(2, 540, 600, None, None, week.isoformat())            # weekly, wrong day excepted
+    book(3, 540, 600, None, None, (week + timedelta(days=3)).isoformat())  # this date skipped
+    assert aggregate() == [(room.id, 0, 9, 60, 1), (room.id, 2, 9, 60, 1)]
+
+
+def test_incremental_updates_match_a_rebuild(app):
+    week = utilization.current_week()
+    book(0, 510, 630, week - WEEK, None)
+    room = book(4, 600, 660)
+
+    def move():
+        # Loaded inside the write, as the app does, so the old row is known
+        booking = Booking.query.filter_by(day=4).one()
+        booking.day, booking.start_min = 2, 570
+    run_write(move)
+    run_write(lambda: db.session.delete(Booking.query.filter_by(day=0).one()))
+    book(4, 480, 540, week + timedelta(days=4), week + timedelta(days=4))
+    incremental = aggregate()
+    run_write(lambda: utilization.rebuild(db.session))
+    assert incremental == aggregate()
+    assert {(r[1], r[2]) for r in incremental} == {(2, 9), (2, 10), (4, 8)}
+    assert room.id == incremental[0][0]
+
+
+def test_purge_keeps_this_weeks_past_dates_on_stats(app):
+    week = utilization.current_week()
+    room = book(0, 540, 600, week, week)                        # this week's Monday, maybe past
+    book(0, 600, 660, week - WEEK, week - WEEK)                 # last week: purged
+    assert booked_minutes(app, room) == 60
+
+    assert remove_past_bookings() == 1
+    assert Booking.query.count() == 1
+    assert booked_minutes(app, room) == 60
+
+
+def test_purge_rolls_the_aggregate_over_and_stats_only_read(app):
+    week = utilization.current_week()
+    room = book(0, 540, 600, week - WEEK, week - WEEK)          # counted last week only
+    run_write(lambda: utilization.rebuild(db.session, week - WEEK))
+    client = app.test_client()
+
+    first = client.get("/api/stats")
+    assert first.get_json()["week"] == (week - WEEK).isoformat()
+    assert utilization.stored_week(db.session) == week - WEEK   # the GET didn't roll over
+    assert client.get("/api/stats", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    assert remove_past_bookings() == 1
+    assert utilization.stored_week(db.session) == week
+    second = client.get("/api/stats", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.get_json()["week"] == week.isoformat()
+    assert booked_minutes(app, room) == 0
@@ -0,0 +1,71 @@
+# timetable_import.py
+# Readers for semester timetable files (CSV or JSON Lines) and the conflict
+# report written after an import.
+
+import csv
+import io
+import json
+
+FIELDS = ("room", "teacher", "day", "start", "end")
+OPTIONAL_FIELDS = ("date", "valid_from", "valid_to")   # as on the booking form
+REPORT_HEADER = ["line", "status", "room", "teacher", "day", "start", "end", "detail"]
+
+
+def detect_format(filename, default="csv"):
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def read_rows(lines, fmt):
+    """Yield (line number, {field: value}) from an iterable of text lines.
+
+    CSV needs a header row naming the fields (any order, any case); JSON
+    Lines needs one object per line. OPTIONAL_FIELDS are read when present
+    and are otherwise "". A line that can't be read yields a ValueError in
+    place of the dict so the caller can report it.
+    """
+    if fmt == "jsonl":
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, ValueError("Not valid JSON.")
+                continue
+            if not isinstance(record, dict):
+                yield line_no, ValueError("Each line must be a JSON object.")
+                continue
+            yield line_no, {f: str(record.get(f) or "").strip() for f in FIELDS + OPTIONAL_FIELDS}
+        return
+
+    reader = csv.reader(lines)
+    header = [h.strip().lower() for h in next(reader, [])]
+    missing = [f for f in FIELDS if f not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}.")
+    columns = {f: header.index(f) for f in FIELDS + OPTIONAL_FIELDS if f in header}
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        if len(values) < len(header):
+            values = values + [""] * (len(header) - len(values))
+        fields = dict.fromkeys(OPTIONAL_FIELDS, "")
+        fields.update((f, values[i].strip()) for f, i in columns.items())
+        yield reader.line_num, fields
+
+
+def text_lines(binary_stream, encoding="utf-8-sig"):
+    """Wrap an uploaded (binary) file so it can be read line by line."""
+    return io.TextIOWrapper(binary_stream, encoding=encoding, newline="")
+
+
+def write_report(problems, out):
+    """Write import problems as CSV; problems are dicts keyed by REPORT_HEADER."""
+    writer = csv.DictWriter(out, REPORT_HEADER)
+    writer.writeheader()
+    writer.writerows(problems)
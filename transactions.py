@@ -0,0 +1,74 @@
+# transactions.py
+# SQLite tuning for many gunicorn workers/threads, and write transactions
+# that take the database write lock up front.
+
+import logging
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+log = logging.getLogger(__name__)
+
+
+def configure_sqlite(engine, busy_timeout_ms=5000):
+    """WAL journal, busy timeout and explicit BEGIN handling for an SQLite engine.
+
+    pysqlite normally issues BEGIN itself (and only before DML). It is switched
+    to autocommit here so the "begin" hook decides: plain BEGIN for readers,
+    BEGIN IMMEDIATE for connections opened with the sqlite_immediate option.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")      # readers never block the writer
+        cursor.execute("PRAGMA synchronous=NORMAL")    # durable enough with WAL, far fewer fsyncs
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        if conn.get_execution_options().get("sqlite_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+
+def is_locked_error(exc):
+    message = str(getattr(exc, "orig", exc)).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def atomic_write(session, work, retries=5, backoff=0.05):
+    """Run work() in a BEGIN IMMEDIATE transaction and commit it.
+
+    Holding the write lock from the start makes a check-then-insert in work()
+    atomic across processes. If the lock can't be had within busy_timeout the
+    whole transaction is retried up to `retries` times with jittered
+    exponential backoff. work() must not commit itself; its return value is
+    passed through.
+    """
+    attempt = 0
+    while True:
+        session.rollback()  # end any read transaction so BEGIN IMMEDIATE starts the next one
+        try:
+            session.connection(execution_options={"sqlite_immediate": True})
+            result = work()
+            session.commit()
+            return result
+        except OperationalError as e:
+            session.rollback()
+            if not is_locked_error(e) or attempt >= retries:
+                raise
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            log.warning("database locked, retrying write in %.3fs (attempt %d)", delay, attempt + 1)
+            time.sleep(delay)
+            attempt += 1
+        except Exception:
+            session.rollback()
+            raise
@@ -0,0 +1,121 @@
+# utilization.py
+# Booked minutes per (room, weekday, hour) in the room_utilization table,
+# behind the /stats heatmap.
+#
+# The table counts one calendar week: the bookings that actually occur in it,
+# so future, expired and skipped dates don't inflate it and two one-offs in
+# the same slot on different weeks never look like an overlap. The week is
+# kept in utilization_week; roll_over() rebuilds once it is over.
+#
+# booking_events.record() hands every batch of booking changes to apply()
+# inside the writing transaction, so the table always moves together with the
+# bookings and /stats reads pre-summed rows however many bookings exist.
+# rebuild() recomputes it from scratch in one set-based INSERT ... SELECT.
+
+from datetime import date, timedelta
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from models import RoomUtilization, UtilizationWeek
+import recurrence
+
+# One row per room, weekday and hour a booking touches in the week starting
+# :week (ISO date): the minutes it covers in that hour, summed, and how many
+# bookings do. Dates are stored as ISO text, so they compare as strings.
+# migrate_db runs it too.
+REBUILD_SQL = """
+INSERT INTO room_utilization (classroom_id, day, hour, minutes, bookings)
+WITH RECURSIVE hours(hour) AS (SELECT 0 UNION ALL SELECT hour + 1 FROM hours WHERE hour < 23),
+dated AS (SELECT b.*, date(:week, '+' || b.day || ' days') AS on_date FROM booking b)
+SELECT b.classroom_id, b.day, h.hour,
+       SUM(MIN(b.end_min, (h.hour + 1) * 60) - MAX(b.start_min, h.hour * 60)), COUNT(*)
+FROM dated b JOIN hours h ON b.start_min < (h.hour + 1) * 60 AND b.end_min > h.hour * 60
+WHERE (b.valid_from IS NULL OR b.valid_from <= b.on_date)
+  AND (b.valid_to IS NULL OR b.valid_to >= b.on_date)
+  AND instr(',' || COALESCE(b.except_dates, '') || ',', ',' || b.on_date || ',') = 0
+GROUP BY b.classroom_id, b.day, h.hour
+"""
+
+
+def current_week(today=None):
+    """Monday of the week the table should count."""
+    return recurrence.week_start(today or date.today())
+
+
+def stored_week(session):
+    """Monday of the week the table counts now, or None if it was never built."""
+    return session.execute(select(UtilizationWeek.week)).scalar()
+
+
+def occurs_in(row, week):
+    """True if a BookingRow's rule has a date in the week starting `week`."""
+    rule = recurrence.Rule(row.valid_from, row.valid_to, recurrence.parse_dates(row.except_dates))
+    return recurrence.occurs_on(rule, row.day, week + timedelta(days=row.day))
+
+
+def hour_spans(start_min, end_min):
+    """(hour, minutes) pieces of [start_min, end_min): 09:30-11:00 -> (9, 30), (10, 60)."""
+    for hour in range(start_min // 60, (end_min + 59) // 60):
+        yield hour, min(end_min, (hour + 1) * 60) - max(start_min, hour * 60)
+
+
+def deltas(changes, week):
+    """{(classroom_id, day, hour): (minutes, bookings)} added by a batch of BookingChanges.
+
+    Only rows with a date in the week starting `week` count.
+    """
+    totals = {}
+
+    def add(row, sign):
+        if not occurs_in(row, week):
+            return
+        for hour, minutes in hour_spans(row.start_min, row.end_min):
+            key = (row.classroom_id, row.day, hour)
+            booked, count = totals.get(key, (0, 0))
+            totals[key] = (booked + sign * minutes, count + sign)
+
+    for change in changes:
+        if change.op != "insert":
+            add(change.old if change.op == "update" else change.row, -1)
+        if change.op != "delete":
+            add(change.row, 1)
+    return {key: value for key, value in totals.items() if value != (0, 0)}
+
+
+def apply(connection, changes):
+    """Upsert the deltas of changes into room_utilization (one executemany).
+
+    Deltas are taken for the stored week, even if it is over, so the table
+    stays consistent until roll_over() rebuilds it.
+    """
+    week = stored_week(connection)
+    if week is None:
+        return  # never built; the first roll_over() counts these bookings
+    rows = [dict(classroom_id=classroom_id, day=day, hour=hour, minutes=minutes, bookings=count)
+            for (classroom_id, day, hour), (minutes, count) in deltas(changes, week).items()]
+    if not rows:
+        return
+    table = RoomUtilization.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.classroom_id, table.c.day, table.c.hour],
+        set_=dict(minutes=table.c.minutes + stmt.excluded.minutes,
+                  bookings=table.c.bookings + stmt.excluded.bookings),
+    )
+    connection.execute(stmt, rows)
+
+
+def rebuild(session, week=None):
+    """Recompute room_utilization for a week (default: this one) from the Booking table. Caller commits."""
+    week = week or current_week()
+    session.execute(delete(RoomUtilization))
+    session.execute(text(REBUILD_SQL), {"week": week.isoformat()})
+    session.execute(delete(UtilizationWeek))
+    session.execute(insert(UtilizationWeek.__table__).values(id=1, week=week))
+
+
+def roll_over(session, week):
+    """rebuild() for `week` unless another writer already did. Call under the write lock."""
+    if stored_week(session) != week:
+        rebuild(session, week)